@@ -0,0 +1,132 @@
+"""
+Mixit Batch Scheduler
+Runs queued mix jobs on a bounded pool of worker threads
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from process_runner import CancelToken, MixCancelled
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def get_batch_workers():
+    """Default number of jobs mixed at the same time (stream copy is mostly I/O bound)."""
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+class BatchJob:
+    """State of one queued job."""
+
+    def __init__(self, index, spec):
+        self.index = index
+        self.spec = spec  # the job dict as queued by the caller
+        self.status = PENDING
+        self.progress = 0.0
+        self.eta = None  # estimated seconds left while running
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+class BatchScheduler:
+    """
+    Runs jobs concurrently with at most `workers` at a time.
+
+    run_job(spec, report_progress, cancel_token) does the actual work and
+    returns the job result; report_progress(fraction, eta=None) may be called
+    from any thread, and cancel_token should be handed to the engine so cancel()
+    also stops running jobs.
+    on_update(job) is called on every status change and, throttled to
+    `update_interval` seconds, on progress changes.
+    """
+
+    def __init__(self, run_job, workers=None, on_update=None, update_interval=0.5):
+        self.run_job = run_job
+        self.workers = workers or get_batch_workers()
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.jobs = []
+        self.cancel_token = CancelToken()
+        self._lock = threading.Lock()
+        self._last_update = 0.0
+
+    def cancel(self):
+        """Stop running jobs and mark jobs that have not started as cancelled."""
+        self.cancel_token.cancel()
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    @property
+    def overall_progress(self):
+        if not self.jobs:
+            return 0.0
+        return sum(1.0 if job.finished else job.progress for job in self.jobs) / len(self.jobs)
+
+    def summary(self):
+        """Count of jobs per status."""
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+        for job in self.jobs:
+            counts[job.status] += 1
+        return counts
+
+    def _notify(self, job, force=True):
+        if not self.on_update:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_update < self.update_interval:
+                return
+            self._last_update = now
+        self.on_update(job)
+
+    def _run_one(self, job):
+        if self.cancelled:
+            job.status = CANCELLED
+            self._notify(job)
+            return job
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._notify(job)
+
+        def report_progress(fraction, eta=None):
+            job.progress = max(0.0, min(fraction, 1.0))
+            job.eta = eta
+            self._notify(job, force=False)
+
+        try:
+            job.result = self.run_job(job.spec, report_progress, self.cancel_token)
+            job.status = DONE
+            job.progress = 1.0
+            job.eta = 0.0
+        except MixCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+        self._notify(job)
+        return job
+
+    def run(self, specs):
+        """Run all jobs and block until they are finished. Returns the BatchJob list."""
+        self.jobs = [BatchJob(i, spec) for i, spec in enumerate(specs)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(self._run_one, self.jobs))
+        return self.jobs
@@ -0,0 +1,209 @@
+"""
+Mixit Crossfade
+Segmented smooth-audio rendering: every song-to-song transition is encoded
+as its own short chunk (in parallel) and the untouched middle of each track
+is stream-copied, so only N x crossfade seconds of audio are re-encoded.
+Rendered transitions are cached, so a pairing used before costs nothing.
+The encoder priming and padding of every chunk is trimmed like fast-mode
+songs (see gapless.py), so song changes add no gap and no drift
+"""
+
+import os
+import math
+from concurrent.futures import ThreadPoolExecutor
+from ffmpeg_helper import get_ffmpeg_path
+from process_runner import run_process
+from planner import PlanEntry
+from gapless import gapless_entries
+from file_cache import FileCache, source_key, GB
+from normalizer import DEFAULT_AUDIO_BITRATE
+
+# codec -> (encoder, chunk extension, samples per frame)
+# Cuts are aligned to whole frames so copied middles and chunks meet exactly
+SEGMENT_CODECS = {
+    'mp3': ('libmp3lame', '.mp3', 1152),
+    'aac': ('aac', '.m4a', 1024),
+}
+
+
+def get_crossfade_workers():
+    """Default number of transition chunks encoded at once (audio encoders are single-threaded)."""
+    return max(1, os.cpu_count() or 1)
+
+
+class AudioFormat:
+    """Codec parameters shared by every track of a segmented crossfade."""
+
+    __slots__ = ('codec', 'sample_rate', 'channels', 'bit_rate')
+
+    def __init__(self, codec, sample_rate, channels, bit_rate):
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bit_rate = bit_rate
+
+    @property
+    def encoder(self):
+        return SEGMENT_CODECS[self.codec][0]
+
+    @property
+    def ext(self):
+        return SEGMENT_CODECS[self.codec][1]
+
+    @property
+    def frame_duration(self):
+        """Seconds per audio frame (packet)."""
+        return SEGMENT_CODECS[self.codec][2] / float(self.sample_rate)
+
+    def key(self):
+        """Encoder settings that go into transition cache keys."""
+        return [self.codec, self.encoder, self.sample_rate, self.channels, self.bit_rate]
+
+
+class SegmentedCrossfade:
+    """
+    Renders a crossfaded playlist as a concat list of
+    [track 1 middle, transition 1-2, track 2 middle, transition 2-3, ...].
+    Transitions live in a content-addressed cache keyed by both tracks,
+    their cut points, the crossfade length and curve, and the encoder settings.
+    """
+
+    def __init__(self, curve="tri", workers=None, max_bytes=2 * GB):
+        self.curve = curve  # acrossfade curve for both sides
+        self.workers = workers or get_crossfade_workers()
+        self.cache = FileCache("crossfades", max_bytes=max_bytes)
+
+    def audio_format(self, tracks, media):
+        """
+        Shared AudioFormat of tracks, or None if they cannot be joined by
+        stream copy (mixed codecs, sample rates or channel counts).
+        """
+        streams = [media[track].audio for track in tracks]
+        if not streams or any(stream is None for stream in streams):
+            return None
+
+        first = streams[0]
+        if first.codec_name not in SEGMENT_CODECS or not first.sample_rate or not first.channels:
+            return None
+        for stream in streams[1:]:
+            if (stream.codec_name, stream.sample_rate, stream.channels) != \
+                    (first.codec_name, first.sample_rate, first.channels):
+                return None
+
+        return AudioFormat(first.codec_name, first.sample_rate, first.channels, DEFAULT_AUDIO_BITRATE)
+
+    def pair_format(self, fmt, stream_a, stream_b):
+        """
+        fmt with the higher bitrate of the two tracks, so a transition only
+        depends on its own pair (and stays cacheable across playlists).
+        """
+        bit_rates = [stream.bit_rate for stream in (stream_a, stream_b) if stream.bit_rate]
+        bit_rate = max(bit_rates) if bit_rates else DEFAULT_AUDIO_BITRATE
+        return AudioFormat(fmt.codec, fmt.sample_rate, fmt.channels, bit_rate)
+
+    def cut_points(self, duration, crossfade, fmt):
+        """
+        Frame-aligned (head, tail) cut points of a track: the copied middle
+        runs from head to tail, the rest goes into the neighbouring transitions.
+        """
+        frame = fmt.frame_duration
+        head = math.ceil(crossfade / frame) * frame
+        tail = math.floor((duration - crossfade) / frame) * frame
+        return round(head, 6), round(tail, 6)
+
+    def build_command(self, track_a, tail_a, track_b, head_b, crossfade, fmt, output_path):
+        """ffmpeg arguments for one transition chunk: end of track_a faded into the start of track_b."""
+        return [
+            get_ffmpeg_path(), '-y', '-v', 'error',
+            '-ss', f"{tail_a:.6f}", '-i', track_a,
+            '-t', f"{head_b:.6f}", '-i', track_b,
+            '-filter_complex', f"[0:a][1:a]acrossfade=d={crossfade}:c1={self.curve}:c2={self.curve}[a]",
+            '-map', '[a]',
+            '-c:a', fmt.encoder, '-b:a', str(fmt.bit_rate),
+            '-ar', str(fmt.sample_rate), '-ac', str(fmt.channels),
+            output_path
+        ]
+
+    def transition_key(self, track_a, tail_a, track_b, head_b, crossfade, fmt):
+        return self.cache.make_key(
+            'xfade', source_key(track_a), tail_a, source_key(track_b), head_b,
+            crossfade, self.curve, fmt.key()
+        )
+
+    def render_transition(self, track_a, tail_a, track_b, head_b, crossfade, fmt,
+                          cancel_token=None, stall_timeout=None):
+        """
+        Return the path of one transition chunk, encoding it only on a cache miss.
+        Returns None if ffmpeg failed.
+        """
+        try:
+            key = self.transition_key(track_a, tail_a, track_b, head_b, crossfade, fmt)
+        except FileNotFoundError as e:
+            print(f"Crossfade source missing: {e}")
+            return None
+        cached = self.cache.lookup(key, fmt.ext)
+        if cached:
+            return cached
+
+        temp_path = self.cache.temp_path_for(key, fmt.ext)
+        cmd = self.build_command(track_a, tail_a, track_b, head_b, crossfade, fmt, temp_path)
+        try:
+            result = run_process(cmd, cancel_token=cancel_token, stall_timeout=stall_timeout)
+        except BaseException:
+            self.cache.discard(temp_path)
+            raise
+        if not result.ok:
+            self.cache.discard(temp_path)
+            print(f"Crossfade failed for {os.path.basename(track_a)} -> "
+                  f"{os.path.basename(track_b)}: {result.last_error()}")
+            return None
+        return self.cache.commit(temp_path, key, fmt.ext)
+
+    def render(self, tracks, media, crossfade, cancel_token=None, stall_timeout=None):
+        """
+        Fetch or encode all transitions (misses in parallel).
+        Returns the audio concat entries (PlanEntry middles and transition
+        chunks, trimmed to their audible packets where ffprobe can tell),
+        or None if the tracks cannot be segmented or a chunk failed
+        (the caller then falls back to a single acrossfade filter graph).
+        Raises MixCancelled / MixTimeout like run_process.
+        """
+        fmt = self.audio_format(tracks, media)
+        if fmt is None or len(tracks) < 2:
+            return None
+
+        last = len(tracks) - 1
+        cuts = []
+        for i, track in enumerate(tracks):
+            head, tail = self.cut_points(media[track].duration, crossfade, fmt)
+            if 0 < i < last and tail <= head:
+                return None  # too short to keep a middle between two fades
+            cuts.append((head, tail))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    self.render_transition,
+                    tracks[i], cuts[i][1], tracks[i + 1], cuts[i + 1][0], crossfade,
+                    self.pair_format(fmt, media[tracks[i]].audio, media[tracks[i + 1]].audio),
+                    cancel_token, stall_timeout
+                )
+                for i in range(len(tracks) - 1)
+            ]
+            chunks = [future.result() for future in futures]
+
+        if not all(chunks):
+            return None
+        chunks = gapless_entries(chunks, workers=self.workers, cancel_token=cancel_token)
+
+        entries = []
+        for i, track in enumerate(tracks):
+            head, tail = cuts[i]
+            entries.append(PlanEntry(
+                track, media[track].duration,
+                inpoint=head if i > 0 else None,
+                outpoint=tail if i < last else None
+            ))
+            if i < last:
+                entries.append(chunks[i])
+        return entries
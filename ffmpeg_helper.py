@@ -1,6 +1,10 @@
 import os
 import sys
 import shutil
+import subprocess
+
+# Hide console windows of child processes on Windows (the flag does not exist elsewhere)
+NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
 
 def get_base_path():
     """
@@ -22,7 +26,7 @@ def get_ffmpeg_path():
       2. System PATH.
     """
     base = get_base_path()
-    bundled = os.path.join(base, 'bin', 'ffmpeg.exe')
+    bundled = os.path.join(base, 'bin', 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg')
     
     if os.path.exists(bundled):
         return bundled
@@ -42,7 +46,7 @@ def get_ffprobe_path():
       2. System PATH.
     """
     base = get_base_path()
-    bundled = os.path.join(base, 'bin', 'ffprobe.exe')
+    bundled = os.path.join(base, 'bin', 'ffprobe.exe' if sys.platform == 'win32' else 'ffprobe')
     
     if os.path.exists(bundled):
         return bundled
@@ -53,3 +57,24 @@ def get_ffprobe_path():
         return system_ffprobe
     
     raise FileNotFoundError("FFprobe not found. Place ffprobe.exe in the 'bin' folder or install it to PATH.")
+
+def get_cache_dir():
+    """
+    Returns the per-user cache folder for Mixit (created if missing).
+    Priority:
+      1. MIXIT_CACHE_DIR environment variable.
+      2. %LOCALAPPDATA%/Mixit/cache on Windows.
+      3. $XDG_CACHE_HOME/mixit or ~/.cache/mixit elsewhere.
+    """
+    override = os.environ.get('MIXIT_CACHE_DIR')
+    if override:
+        cache_dir = override
+    elif sys.platform == 'win32':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        cache_dir = os.path.join(root, 'Mixit', 'cache')
+    else:
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        cache_dir = os.path.join(root, 'mixit')
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,131 @@
+"""
+Mixit File Cache
+Content-addressed folder of rendered media with size-based LRU eviction
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
+from collections import Counter
+from ffmpeg_helper import get_cache_dir
+from probe_cache import ProbeCache
+
+GB = 1024 ** 3
+
+# Files used this recently are never evicted: another process may be
+# rendering with them right now
+RECENT_USE_SECONDS = 3600
+
+# Cache files held by renders running in this process (path -> render count)
+_pinned = Counter()
+_pinned_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def pinned(paths):
+    """Keep paths out of every FileCache eviction while the block runs."""
+    paths = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+    with _pinned_lock:
+        _pinned.update(paths)
+    try:
+        yield
+    finally:
+        with _pinned_lock:
+            _pinned.subtract(paths)
+            for path in paths:
+                if _pinned[path] <= 0:
+                    del _pinned[path]
+
+
+def source_key(file_path):
+    """
+    Identity of a source file for cache keys: absolute path, size and mtime.
+    A changed source therefore never matches an old cache entry.
+    """
+    key = ProbeCache.file_key(file_path)
+    if key is None:
+        raise FileNotFoundError(file_path)
+    return list(key)
+
+
+class FileCache:
+    """
+    Folder of files named after a hash of everything that produced them.
+    Hits refresh the file mtime. evict() deletes the oldest files once the
+    folder grows above max_bytes; it is run between renders, never on
+    commit, so files a render has already planned with stay in place.
+    """
+
+    def __init__(self, name, max_bytes=10 * GB, root=None):
+        self.root = root or os.path.join(get_cache_dir(), name)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash any JSON-serializable parts into a cache key."""
+        blob = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(blob.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, ext):
+        return os.path.join(self.root, key + ext)
+
+    def temp_path_for(self, key, ext):
+        """Scratch path to render into before commit() (keeps the extension for ffmpeg)."""
+        return os.path.join(self.root, f"{key}.part{threading.get_ident()}{ext}")
+
+    def lookup(self, key, ext):
+        """Return the cached file path, or None on a miss."""
+        path = self.path_for(key, ext)
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return None
+        return path
+
+    def commit(self, temp_path, key, ext):
+        """Move a finished render into place (see evict() for the size cap)."""
+        path = self.path_for(key, ext)
+        os.replace(temp_path, path)
+        return path
+
+    def discard(self, temp_path):
+        """Remove an unfinished render."""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def evict(self, keep=()):
+        """
+        Delete least recently used files until the folder fits in max_bytes.
+        Files in keep, pinned by a running render or used within
+        RECENT_USE_SECONDS are skipped.
+        """
+        keep = {os.path.abspath(path) for path in keep}
+        recent = time.time() - RECENT_USE_SECONDS
+        with self._lock, _pinned_lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.root):
+                if not entry.is_file() or '.part' in entry.name:
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+            entries.sort()
+            for mtime, size, path in entries:
+                if total <= self.max_bytes or mtime > recent:
+                    break  # the rest is newer still
+                if os.path.abspath(path) in keep or os.path.abspath(path) in _pinned:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
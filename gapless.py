@@ -0,0 +1,141 @@
+"""
+Mixit Gapless
+Reads encoder delay/padding and packet timing of music tracks so the fast-mode
+audio concat list can trim them on packet boundaries: no priming silence
+between songs and no drift from estimated container durations
+"""
+
+import json
+from ffmpeg_helper import get_ffprobe_path
+from process_runner import run_process
+from probe_cache import get_probe_cache
+from planner import PlanEntry
+from utils import probe_media, probe_many_cached
+
+# Seconds before the end where the tail packets are read
+TAIL_WINDOW = 5.0
+
+
+def probe_gapless(file_path):
+    """
+    Return packet timing of the first audio stream:
+    {"start", "end", "frame" (seconds), "delay", "padding" (samples), "sample_rate"}.
+    Cached in the probe cache. Returns None if probing failed.
+    """
+    cached = get_probe_cache().get(file_path, "gapless")
+    if cached is not None:
+        return cached
+    return _probe_gapless(file_path)
+
+
+def _probe_gapless(file_path):
+    duration = probe_media(file_path).duration
+    if duration <= 0:
+        return None
+
+    # Only the first packets (encoder delay) and the last ones (padding) are read
+    tail = max(duration - TAIL_WINDOW, 0.0)
+    cmd = [
+        get_ffprobe_path(),
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-read_intervals', f"%+#4,{tail:.3f}%",
+        '-show_entries', 'stream=sample_rate:packet=pts_time,duration_time:packet_side_data',
+        '-of', 'json',
+        file_path
+    ]
+    try:
+        result = run_process(cmd, capture_stdout=True)
+        if not result.ok:
+            print(f"Error reading gapless info of {file_path}: {result.last_error()}")
+            return None
+        info = _parse_packets(json.loads(result.stdout))
+    except (OSError, ValueError) as e:
+        print(f"Error reading gapless info of {file_path}: {e}")
+        return None
+
+    if info:
+        get_probe_cache().put(file_path, "gapless", info)
+    return info
+
+
+def _parse_packets(data):
+    if not isinstance(data, dict):
+        return None
+    streams = data.get("streams") or [{}]
+    try:
+        sample_rate = int(streams[0].get("sample_rate") or 0)
+    except ValueError:
+        sample_rate = 0
+
+    packets = []
+    for packet in data.get("packets", []):
+        try:
+            packets.append((float(packet["pts_time"]), float(packet["duration_time"]), packet))
+        except (KeyError, ValueError):
+            continue  # N/A timestamps
+    if not packets or not sample_rate:
+        return None
+    packets.sort(key=lambda item: item[0])
+
+    delay = padding = 0
+    for _, _, packet in packets:
+        for side_data in packet.get("side_data_list", []):
+            if side_data.get("side_data_type") == "Skip Samples":
+                delay = max(delay, int(side_data.get("skip_samples") or 0))
+                padding = max(padding, int(side_data.get("discard_padding") or 0))
+
+    start, frame, _ = packets[0]
+    last_pts, last_duration, _ = packets[-1]
+    return {
+        "start": start,
+        "end": last_pts + last_duration,
+        "frame": frame,
+        "delay": delay,
+        "padding": padding,
+        "sample_rate": sample_rate,
+    }
+
+
+def gapless_many(paths, workers=None, cancel_token=None):
+    """Gapless info for many files in parallel. Returns dict of path -> dict (or None)."""
+    return probe_many_cached(paths, "gapless", _probe_gapless, workers, cancel_token=cancel_token)
+
+
+def trim_points(info):
+    """
+    (inpoint, outpoint) that drop priming and padding, rounded to whole
+    packets so stream copy can honour them exactly. The outpoint is always
+    set: each song then lasts exactly its packets, whatever the container
+    claims, so timing cannot drift over a long playlist.
+    """
+    frame = info["frame"]
+    if frame <= 0:
+        return None, None
+    start = info["start"]
+    sample_rate = float(info["sample_rate"])
+
+    # Priming: skip-samples side data, or packets before zero (edit lists)
+    delay = max(info["delay"] / sample_rate, -start)
+    first = start + round(delay / frame) * frame
+    audible_end = info["end"] - info["padding"] / sample_rate
+    last = start + round((audible_end - start) / frame) * frame
+
+    if last <= first:
+        return None, None
+    return (round(first, 6) if first > 0 else None), round(last, 6)
+
+
+def gapless_entries(tracks, workers=None, cancel_token=None):
+    """
+    Audio concat entries (PlanEntry) for tracks with gapless trims.
+    Tracks without usable packet info are passed through untrimmed.
+    """
+    infos = gapless_many(tracks, workers, cancel_token)
+    entries = []
+    for track in tracks:
+        info = infos.get(track)
+        inpoint, outpoint = trim_points(info) if info else (None, None)
+        duration = info["end"] if info else 0.0
+        entries.append(PlanEntry(track, duration, inpoint, outpoint) if outpoint else track)
+    return entries
@@ -0,0 +1,205 @@
+"""
+Mixit Jobs
+Durable job manifests: every queued mix is kept on disk with its settings,
+seed, resolved plan and state, so a queue survives restarts and crashes
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from ffmpeg_helper import get_cache_dir
+from batch import BatchScheduler, PENDING, RUNNING, DONE, FAILED, CANCELLED
+from process_runner import MixCancelled
+from planner import MixPlan
+
+MANIFEST_VERSION = 1
+
+
+class JobManifest:
+    """
+    JSON file holding a queue of jobs. Each job is a dict:
+        id, settings (video_folder, music_files, duration, smooth_audio,
+        format, output_path), seed, status, plan (MixPlan.to_dict of the
+        MixerEngine.plan_mix result, once resolved), output, error,
+        number, created, updated.
+    number comes from a counter that only grows (it survives clear()), so
+    callers can use it for output names that never repeat.
+    Every change is written atomically (temp file + rename).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_cache_dir(), "jobs.json")
+        self.jobs = []
+        self.next_number = 1
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """
+        Read the manifest; a missing or unreadable file is an empty queue
+        and malformed jobs are skipped.
+        """
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                jobs = list(data.get("jobs", []))
+                next_number = int(data.get("next_number", 1))
+            except (OSError, ValueError, TypeError, AttributeError):
+                jobs, next_number = [], 1
+            self.jobs = [job for job in jobs if _valid_job(job)]
+            if len(self.jobs) < len(jobs):
+                print(f"Skipped {len(jobs) - len(self.jobs)} malformed job(s) in {self.path}")
+            numbers = [job.get("number") or 0 for job in self.jobs]
+            self.next_number = max([next_number] + [number + 1 for number in numbers])
+            # Jobs that were running when the app stopped start over (or resume)
+            for job in self.jobs:
+                if job["status"] == RUNNING:
+                    job["status"] = PENDING
+        return self.jobs
+
+    def save(self):
+        with self._lock:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            temp = self.path + ".part"
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({"version": MANIFEST_VERSION, "next_number": self.next_number, "jobs": self.jobs}, f, indent=1)
+            os.replace(temp, self.path)
+
+    def add(self, settings, seed=None):
+        """Queue a job and return it. The seed fixes every random choice of its plan."""
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "settings": dict(settings),
+            "seed": seed if seed is not None else random.randrange(2 ** 32),
+            "status": PENDING,
+            "plan": None,
+            "output": None,
+            "error": None,
+            "created": now,
+            "updated": now,
+        }
+        with self._lock:
+            job["number"] = self.next_number
+            self.next_number += 1
+            self.jobs.append(job)
+            self.save()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self.jobs:
+                if job["id"] == job_id:
+                    return job
+        return None
+
+    def update(self, job_id, **fields):
+        """Change fields of one job and write the manifest."""
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            job["updated"] = time.time()
+            self.save()
+            return job
+
+    def unfinished(self):
+        """Jobs that still have to run (anything not done)."""
+        with self._lock:
+            return [job for job in self.jobs if job["status"] != DONE]
+
+    def clear(self, finished_only=False):
+        """Remove all jobs, or only the ones that are done."""
+        with self._lock:
+            if finished_only:
+                self.jobs = [job for job in self.jobs if job["status"] != DONE]
+            else:
+                self.jobs = []
+            self.save()
+
+
+def _valid_job(job):
+    """True for a job dict with the fields the runner relies on."""
+    return (
+        isinstance(job, dict)
+        and isinstance(job.get("id"), str)
+        and isinstance(job.get("settings"), dict)
+        and all(key in job["settings"] for key in ("video_folder", "duration", "output_path"))
+        and job.get("status") in (PENDING, RUNNING, DONE, FAILED, CANCELLED)
+        and "seed" in job
+    )
+
+
+class JobRunner:
+    """
+    Runs the unfinished jobs of a manifest on a BatchScheduler.
+
+    A job is planned once with its seed and the plan is stored in
+    the manifest before rendering starts; after a crash or restart the same
+    plan is rendered again (or re-planned with the seed when files it
+    needs have gone from the caches) (with MixerEngine.segments > 1 finished chunks are
+    reused too). Completed jobs are skipped.
+    """
+
+    def __init__(self, manifest, engine, workers=None, on_update=None):
+        self.manifest = manifest
+        self.engine = engine
+        self.scheduler = BatchScheduler(self._run_job, workers=workers, on_update=on_update)
+
+    def cancel(self):
+        self.scheduler.cancel()
+
+    def run(self):
+        """Run every unfinished job and block until done. Returns the BatchJob list."""
+        return self.scheduler.run(self.manifest.unfinished())
+
+    def _run_job(self, job, report_progress, cancel_token):
+        job_id = job["id"]
+        settings = job["settings"]
+        self.manifest.update(job_id, status=RUNNING, error=None)
+        try:
+            plan = MixPlan.from_dict(job["plan"]) if job.get("plan") is not None else None
+            if plan is not None and plan.missing():
+                # The plan points into LRU caches (normalized clips and songs):
+                # plan again with the same seed once those files are evicted
+                print(f"Plan of job {job_id} lost sources, planning again")
+                plan = None
+            if plan is None:
+                plan = self.engine.plan_mix(
+                    settings["video_folder"],
+                    settings["duration"],
+                    music_files=settings.get("music_files"),
+                    smart_audio=settings.get("smooth_audio", False),
+                    seed=job["seed"],
+                    cancel_token=cancel_token
+                )
+                self.manifest.update(job_id, plan=plan.to_dict())
+
+            mix_duration = plan.mix_duration
+
+            def on_progress(event):
+                report_progress(event.fraction(mix_duration), event.eta(mix_duration))
+
+            output = self.engine.render_plan(
+                plan,
+                settings["output_path"],
+                output_format=settings.get("format", "mp4"),
+                cancel_token=cancel_token,
+                on_progress=on_progress
+            )
+        except MixCancelled:
+            self.manifest.update(job_id, status=CANCELLED)
+            raise
+        except Exception as e:
+            self.manifest.update(job_id, status=FAILED, error=str(e))
+            raise
+
+        self.manifest.update(job_id, status=DONE, output=output)
+        return output
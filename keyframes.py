@@ -0,0 +1,101 @@
+"""
+Mixit Keyframes
+Per-clip keyframe index (packet-level ffprobe, no decoding) so stream-copy
+cuts land on keyframes
+"""
+
+import bisect
+from ffmpeg_helper import get_ffprobe_path
+from probe_cache import get_probe_cache
+from process_runner import run_process
+from utils import probe_many_cached
+
+
+def probe_keyframes(file_path):
+    """
+    Return the sorted keyframe timestamps (seconds) of the first video stream.
+    Built once per file from packet flags and kept in the probe cache.
+    Returns [] if probing failed or found no keyframes; that is cached
+    too (until the file changes), so such clips are not probed again.
+    """
+    cached = get_probe_cache().get(file_path, "keyframes")
+    if cached is not None:
+        return cached
+    return _probe_keyframes(file_path)
+
+
+def _probe_keyframes(file_path):
+    cmd = [
+        get_ffprobe_path(),
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        file_path
+    ]
+    try:
+        result = run_process(cmd, capture_stdout=True)
+    except OSError as e:
+        print(f"Error indexing keyframes of {file_path}: {e}")
+        return []
+    if not result.ok:
+        print(f"Error indexing keyframes of {file_path}: {result.last_error()}")
+        get_probe_cache().put(file_path, "keyframes", [])
+        return []
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' not in flags:
+            continue
+        try:
+            keyframes.append(round(float(pts), 6))
+        except ValueError:
+            continue  # pts_time N/A
+    keyframes.sort()
+
+    get_probe_cache().put(file_path, "keyframes", keyframes)
+    return keyframes
+
+
+def keyframes_many(paths, workers=None, cancel_token=None):
+    """Keyframe index for many files in parallel. Returns dict of path -> list."""
+    return probe_many_cached(paths, "keyframes", _probe_keyframes, workers, cancel_token=cancel_token)
+
+
+def snap_inpoint(keyframes, t):
+    """Latest keyframe at or before t (a copy-mode cut can only start on one)."""
+    i = bisect.bisect_right(keyframes, t + 1e-6)
+    return keyframes[i - 1] if i else 0.0
+
+
+def snap_outpoint(keyframes, t):
+    """
+    Earliest keyframe at or after t, so the clip ends on a complete GOP.
+    Returns None if there is none (play to the end of the file).
+    """
+    i = bisect.bisect_left(keyframes, t - 1e-6)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def snap_plan_to_keyframes(entries, workers=None, cancel_token=None):
+    """
+    Move inpoint/outpoint of trimmed planner.PlanEntry items onto keyframes.
+    Only trimmed clips are indexed. Outpoints move later, so the plan never
+    gets shorter; the final length is still cut exactly by -t / -shortest.
+    """
+    trimmed = [e for e in entries if e.inpoint or e.outpoint is not None]
+    if not trimmed:
+        return entries
+
+    index = keyframes_many([e.path for e in trimmed], workers, cancel_token)
+    for entry in trimmed:
+        keyframes = index.get(entry.path)
+        if not keyframes:
+            continue
+        if entry.inpoint:
+            entry.inpoint = snap_inpoint(keyframes, entry.inpoint) or None
+        if entry.outpoint is not None:
+            outpoint = snap_outpoint(keyframes, entry.outpoint)
+            entry.outpoint = outpoint if outpoint is not None and outpoint < entry.duration else None
+    return entries
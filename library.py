@@ -0,0 +1,184 @@
+"""
+Mixit Library Index
+Persistent index of media folders: a folder whose mtime has not changed
+is answered from the index without listing it again
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from ffmpeg_helper import get_cache_dir
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.aac', '.m4a')
+MEDIA_EXTENSIONS = VIDEO_EXTENSIONS + AUDIO_EXTENSIONS
+
+# Coarse filesystem timestamps (FAT: 2 s) need a grace period
+MTIME_SETTLE_SECONDS = 2.0
+
+
+class LibraryIndex:
+    """
+    SQLite-backed listing of media files (size and mtime) per folder.
+
+    Adding or removing a file changes its folder's mtime, so only those
+    folders are listed again; an unchanged folder costs one stat and no
+    listing, whatever number of files it holds. Overwriting a file in
+    place leaves the folder mtime alone, so the stored size/mtime can be
+    stale for such a file; the probe cache and the plan cache stat the
+    files they use and check size/mtime themselves, so an edited file is
+    still probed and planned again.
+    """
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), "library.sqlite3")
+        self.db_path = db_path
+        self.dirs_listed = 0
+        self.dirs_reused = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect(db_path)
+
+    def _connect(self, db_path):
+        try:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            print(f"Library index unavailable ({e}), using memory only")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " scanned REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT PRIMARY KEY,"
+            " dir TEXT NOT NULL,"
+            " is_dir INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_dir ON entries (dir)")
+        conn.commit()
+        return conn
+
+    def _list_dir(self, folder, dir_mtime_ns):
+        """List one folder from disk and store the result (lock held)."""
+        rows = []
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            rows.append((entry.path, folder, 1, 0, 0))
+                        elif entry.is_file() and entry.name.lower().endswith(MEDIA_EXTENSIONS):
+                            st = entry.stat()
+                            rows.append((entry.path, folder, 0, st.st_size, st.st_mtime_ns))
+                    except OSError:
+                        continue  # vanished or unreadable entry
+        except OSError:
+            rows = []
+
+        self._conn.execute("DELETE FROM entries WHERE dir = ?", (folder,))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO entries (path, dir, is_dir, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        # A folder modified just now may change again within the same mtime
+        # tick; don't trust its listing until it has settled
+        now = time.time()
+        if now - dir_mtime_ns / 1e9 < MTIME_SETTLE_SECONDS:
+            dir_mtime_ns = -1
+        self._conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime_ns, scanned) VALUES (?, ?, ?)",
+            (folder, dir_mtime_ns, now)
+        )
+        self.dirs_listed += 1
+        return rows
+
+    def _dir_entries(self, folder):
+        """Current (path, is_dir, size, mtime_ns) rows of one folder, listing it only if it changed."""
+        try:
+            dir_mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            self._forget(folder)
+            return []
+
+        row = self._conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (folder,)).fetchone()
+        if row is not None and row[0] == dir_mtime_ns:
+            self.dirs_reused += 1
+            return self._conn.execute(
+                "SELECT path, is_dir, size, mtime_ns FROM entries WHERE dir = ?", (folder,)
+            ).fetchall()
+
+        rows = self._list_dir(folder, dir_mtime_ns)
+        return [(path, is_dir, size, mtime_ns) for path, _, is_dir, size, mtime_ns in rows]
+
+    def _forget(self, folder):
+        """Drop a folder that no longer exists (lock held)."""
+        self._conn.execute("DELETE FROM entries WHERE dir = ?", (folder,))
+        self._conn.execute("DELETE FROM dirs WHERE path = ?", (folder,))
+
+    def iter_entries(self, folder, extensions=MEDIA_EXTENSIONS, recursive=False):
+        """
+        Yield (path, size, mtime_ns) of media files under folder, one folder
+        at a time (files sorted within each folder), so callers can start
+        on the first results while deeper folders are still being listed.
+        Only folders that changed are listed from disk.
+        """
+        extensions = tuple(ext.lower() for ext in extensions)
+        pending = [os.path.abspath(folder)]
+        while pending:
+            current = pending.pop()
+            with self._lock:
+                rows = sorted(self._dir_entries(current))
+                self._conn.commit()
+            subdirs = []
+            for path, is_dir, size, mtime_ns in rows:
+                if is_dir:
+                    if recursive:
+                        subdirs.append(path)
+                elif path.lower().endswith(extensions):
+                    yield (path, size, mtime_ns)
+            pending.extend(reversed(subdirs))  # visit subfolders in name order
+
+    def entries(self, folder, extensions=MEDIA_EXTENSIONS, recursive=False):
+        """Return [(path, size, mtime_ns)] of media files under folder, sorted by path."""
+        return sorted(self.iter_entries(folder, extensions, recursive))
+
+    def files(self, folder, extensions=MEDIA_EXTENSIONS, recursive=False):
+        """Paths of media files under folder (see entries())."""
+        return [path for path, _, _ in self.entries(folder, extensions, recursive)]
+
+    def snapshot(self, folder, extensions=MEDIA_EXTENSIONS, recursive=False):
+        """
+        Hash of path, size and mtime of every media file under folder, as
+        last listed. It changes whenever a file is added or removed; a
+        file edited in place shows up once its folder is listed again.
+        """
+        digest = hashlib.sha1()
+        for path, size, mtime_ns in self.entries(folder, extensions, recursive):
+            digest.update(f"{path}\0{size}\0{mtime_ns}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def stats(self):
+        """Folders listed from disk vs answered from the index."""
+        return {"dirs_listed": self.dirs_listed, "dirs_reused": self.dirs_reused}
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_library_index():
+    """Return the shared process-wide LibraryIndex."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = LibraryIndex()
+        return _default_index
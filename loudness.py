@@ -0,0 +1,111 @@
+"""
+Mixit Loudness
+EBU R128 analysis per track (measured once, kept in the probe cache) and the
+gain that brings a track to a common target level
+"""
+
+import json
+import math
+from ffmpeg_helper import get_ffmpeg_path
+from probe_cache import get_probe_cache
+from process_runner import run_process
+from utils import probe_many_cached
+
+DEFAULT_TARGET_LUFS = -14.0
+DEFAULT_MAX_TRUE_PEAK = -1.0  # dBTP ceiling after gain
+
+# Skip tiny corrections nobody can hear
+MIN_GAIN_DB = 0.1
+
+
+def measure_loudness(file_path):
+    """
+    Return {"integrated": LUFS, "true_peak": dBTP, "lra": LU} of the first
+    audio stream, analysed once and then answered from the probe cache.
+    Returns None if the analysis failed.
+    """
+    cached = get_probe_cache().get(file_path, "loudness")
+    if cached is not None:
+        return _decode(file_path, cached)
+    return _measure_loudness(file_path)
+
+
+def _decode(file_path, cached):
+    """A cached failure ({"error": ...}) is None, like a fresh one."""
+    return None if "error" in cached else cached
+
+
+def _parse_loudnorm(stderr_text):
+    """Pull the JSON summary that loudnorm prints at the end of stderr."""
+    start = stderr_text.rfind('{')
+    end = stderr_text.rfind('}')
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(stderr_text[start:end + 1])
+        loudness = {
+            "integrated": float(data["input_i"]),
+            "true_peak": float(data["input_tp"]),
+            "lra": float(data["input_lra"]),
+        }
+    except (ValueError, KeyError):
+        return None  # no summary
+    if not all(math.isfinite(value) for value in loudness.values()):
+        return None  # "-inf" for silent tracks
+    return loudness
+
+
+def _measure_loudness(file_path, cancel_token=None):
+    """
+    Run the analysis and cache it. Tracks ffmpeg cannot measure (broken or
+    silent) are cached as {"error": ...} until they change, so the full
+    decode is not repeated on every mix; a missing ffmpeg is not cached.
+    """
+    cmd = [
+        get_ffmpeg_path(), '-hide_banner', '-nostats',
+        '-i', file_path,
+        '-map', '0:a:0',
+        '-af', 'loudnorm=print_format=json',
+        '-f', 'null', '-'
+    ]
+    try:
+        result = run_process(cmd, cancel_token=cancel_token)
+    except OSError as e:
+        print(f"Error measuring loudness of {file_path}: {e}")
+        return None
+    if not result.ok:
+        print(f"Error measuring loudness of {file_path}: {result.last_error()}")
+        get_probe_cache().put(file_path, "loudness", {"error": result.last_error()})
+        return None
+
+    loudness = _parse_loudnorm(result.stderr_text())
+    if loudness is None:
+        print(f"No loudness measurement for {file_path}")
+        get_probe_cache().put(file_path, "loudness", {"error": "no measurement"})
+        return None
+    get_probe_cache().put(file_path, "loudness", loudness)
+    return loudness
+
+
+def loudness_many(paths, workers=None, cancel_token=None):
+    """
+    Loudness of many files in parallel. Returns dict of path -> dict (or None).
+    Cancelling cancel_token stops the running analyses too (each is a full decode).
+    """
+    return probe_many_cached(
+        paths, "loudness", lambda path: _measure_loudness(path, cancel_token), workers,
+        decode=_decode, cancel_token=cancel_token
+    )
+
+
+def track_gain(loudness, target=DEFAULT_TARGET_LUFS, max_true_peak=DEFAULT_MAX_TRUE_PEAK):
+    """
+    Gain in dB that moves a track to target integrated loudness, reduced
+    where needed so its true peak stays under max_true_peak.
+    Returns 0.0 for unmeasured (or silent) tracks.
+    """
+    if not loudness or not all(math.isfinite(loudness[key]) for key in ("integrated", "true_peak")):
+        return 0.0
+    gain = target - loudness["integrated"]
+    gain = min(gain, max_true_peak - loudness["true_peak"])
+    return round(gain, 2) if abs(gain) >= MIN_GAIN_DB else 0.0
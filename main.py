@@ -12,8 +12,12 @@ import json
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from utils import get_video_files, get_audio_files
+from utils import get_video_files, get_audio_files, order_playlist
 from mixer_engine import MixerEngine
+from batch import get_batch_workers, RUNNING, DONE, FAILED
+from jobs import JobManifest, JobRunner
+from process_runner import CancelToken, MixCancelled
+from progress import Throttle
 from ffmpeg_helper import get_ffmpeg_path, get_ffprobe_path
 
 # Version
@@ -39,6 +43,8 @@ TRANSLATIONS = {
         "smooth_audio": "Smooth Audio (crossfade)",
         "start": "START MIXING",
         "mixing": "MIXING...",
+        "cancel": "CANCEL",
+        "cancelled": "Mix cancelled",
         "welcome": "Welcome to Mixit...",
         "found_videos": "Found {0} video files",
         "found_music": "Found {0} music files",
@@ -69,6 +75,8 @@ TRANSLATIONS = {
         "clear_batch": "Clear Batch",
         "run_batch": "Run Batch ({0} jobs)",
         "batch_complete": "Batch complete! {0} mixes created.",
+        "batch_restored": "Restored {0} unfinished batch job(s)",
+        "workers": "Parallel:",
         "playlist_order": "Playlist Order:",
         "random": "Random",
         "alphabetical": "A-Z",
@@ -87,6 +95,8 @@ TRANSLATIONS = {
         "smooth_audio": "Audio Halus (crossfade)",
         "start": "MULAI MIXING",
         "mixing": "SEDANG MIXING...",
+        "cancel": "BATALKAN",
+        "cancelled": "Mix dibatalkan",
         "welcome": "Selamat datang di Mixit...",
         "found_videos": "Ditemukan {0} file video",
         "found_music": "Ditemukan {0} file musik",
@@ -117,6 +127,8 @@ TRANSLATIONS = {
         "clear_batch": "Hapus Batch",
         "run_batch": "Jalankan Batch ({0} job)",
         "batch_complete": "Batch selesai! {0} mix dibuat.",
+        "batch_restored": "Memulihkan {0} job batch yang belum selesai",
+        "workers": "Paralel:",
         "playlist_order": "Urutan Playlist:",
         "random": "Acak",
         "alphabetical": "A-Z",
@@ -146,13 +158,21 @@ class MixitApp(TkinterDnD.Tk):
         
         self.engine = MixerEngine()
         self.is_mixing = False
-        self.batch_jobs = []
+        # Batch queue lives in a manifest on disk, so it survives restarts
+        self.job_manifest = JobManifest()
+        self.batch_jobs = self.job_manifest.unfinished()
+        self.batch_workers = get_batch_workers()
+        self.batch_scheduler = None
+        self.cancel_token = None
         
         # Check FFmpeg on startup
         self._check_ffmpeg()
         
         self._create_widgets()
         self._log(self.t["welcome"])
+        if self.batch_jobs:
+            self.btn_run_batch.configure(text=self._tr("run_batch", len(self.batch_jobs)), state="normal")
+            self._log(self._tr("batch_restored", len(self.batch_jobs)))
         
         # Check for updates in background
         threading.Thread(target=self._check_update_silent, daemon=True).start()
@@ -359,6 +379,18 @@ class MixitApp(TkinterDnD.Tk):
         )
         self.btn_clear_batch.pack(side="left", padx=5, pady=10)
         
+        # Number of batch jobs mixed at the same time
+        self.lbl_workers = ctk.CTkLabel(batch_frame, text=self._tr("workers"))
+        self.lbl_workers.pack(side="left", padx=(10, 5), pady=10)
+        
+        self.workers_var = ctk.StringVar(value=str(self.batch_workers))
+        self.workers_menu = ctk.CTkOptionMenu(
+            batch_frame, values=["1", "2", "3", "4", "6", "8"],
+            variable=self.workers_var, width=60,
+            command=self._on_workers_change
+        )
+        self.workers_menu.pack(side="left", pady=10)
+        
         self.btn_run_batch = ctk.CTkButton(
             batch_frame, text=self._tr("run_batch", 0), width=140,
             command=self._run_batch, state="disabled"
@@ -394,6 +426,7 @@ class MixitApp(TkinterDnD.Tk):
         self.btn_start.configure(text=self._tr("start"))
         self.btn_add_batch.configure(text=self._tr("add_to_batch"))
         self.btn_clear_batch.configure(text=self._tr("clear_batch"))
+        self.lbl_workers.configure(text=self._tr("workers"))
         self.btn_run_batch.configure(text=self._tr("run_batch", len(self.batch_jobs)))
         self.lbl_video_count.configure(text=f"{self._tr('videos')}: {self.video_count}")
         self.lbl_music_count.configure(text=f"{self._tr('music')}: {self.music_count}")
@@ -540,16 +573,13 @@ class MixitApp(TkinterDnD.Tk):
     def _get_ordered_music(self):
         """Get music files in selected order."""
         order = self.order_var.get()
-        files = self.music_files.copy()
         
         if order == self._tr("alphabetical") or order == "A-Z":
-            files.sort(key=lambda x: os.path.basename(x).lower())
+            return order_playlist(self.music_files, "alphabetical")
         elif order == self._tr("random") or order == "Random" or order == "Acak":
-            import random
-            random.shuffle(files)
+            return order_playlist(self.music_files, "random")
         # Manual order is already applied to self.music_files
-        
-        return files
+        return order_playlist(self.music_files, "manual")
     
     def _check_update(self):
         """Check for updates from GitHub."""
@@ -598,24 +628,38 @@ class MixitApp(TkinterDnD.Tk):
         if not output_name.endswith(f".{fmt}"):
             output_name = output_name.rsplit(".", 1)[0] + f".{fmt}"
         
-        job = {
+        # Numbers never repeat, so a kept failed job can't share a name with a new one
+        output_folder = self.output_folder or self.video_folder
+        number = self.job_manifest.next_number
+        settings = {
             "video_folder": self.video_folder,
             "music_files": self._get_ordered_music() if self.music_folder else None,
             "duration": duration,
-            "output_name": f"batch_{len(self.batch_jobs)+1}_{output_name}",
+            "output_path": os.path.join(output_folder, f"batch_{number}_{output_name}"),
             "smooth_audio": self.var_smooth_audio.get(),
             "format": fmt
         }
         
-        self.batch_jobs.append(job)
+        self.job_manifest.add(settings)
+        self.batch_jobs = self.job_manifest.unfinished()
         self.btn_run_batch.configure(
             text=self._tr("run_batch", len(self.batch_jobs)),
             state="normal"
         )
-        self._log(f"Added to batch: {job['output_name']}")
+        self._log(f"Added to batch: {os.path.basename(settings['output_path'])}")
+    
+    def _on_workers_change(self, choice):
+        """Set how many batch jobs run at once."""
+        self.batch_workers = int(choice)
     
     def _clear_batch(self):
-        """Clear batch queue."""
+        """Clear batch queue (while a batch runs: cancel it)."""
+        if self.batch_scheduler:
+            self.batch_scheduler.cancel()
+            self._log("Batch cancelled")
+            return
+        
+        self.job_manifest.clear()
         self.batch_jobs = []
         self.btn_run_batch.configure(
             text=self._tr("run_batch", 0),
@@ -639,35 +683,35 @@ class MixitApp(TkinterDnD.Tk):
         threading.Thread(target=self._execute_batch, daemon=True).start()
     
     def _execute_batch(self):
-        """Execute batch jobs in background."""
-        completed = 0
+        """Execute batch jobs in background, several at a time (state kept in the job manifest)."""
         total = len(self.batch_jobs)
         
-        for i, job in enumerate(self.batch_jobs):
-            self.after(0, lambda j=job: self._log(f"Batch {i+1}/{total}: {j['output_name']}"))
+        def on_update(batch_job):
+            name = os.path.basename(batch_job.spec["settings"]["output_path"])
+            status = batch_job.status
+            error = batch_job.error
+            progress = scheduler.overall_progress
             
-            try:
-                output_folder = self.output_folder or job["video_folder"]
-                output_path = os.path.join(output_folder, job["output_name"])
-                
-                self.engine.render_concat_copy(
-                    video_folder=job["video_folder"],
-                    output_path=output_path,
-                    target_duration=job["duration"],
-                    music_files=job["music_files"],
-                    smart_audio=job["smooth_audio"],
-                    output_format=job["format"],
-                    callback=lambda line: self._update_progress_from_line(line, job["duration"])
-                )
-                completed += 1
-            except Exception as e:
-                self.after(0, lambda e=e: self._log(f"Batch job failed: {e}"))
+            def update():
+                if status == RUNNING and batch_job.progress == 0:
+                    self._log(f"Batch {batch_job.index + 1}/{total}: {name}")
+                elif status == FAILED:
+                    self._log(f"Batch job failed: {name}: {error}")
+                self._update_progress_ui(progress)
+            self.after(0, update)
+        
+        runner = JobRunner(self.job_manifest, self.engine, workers=self.batch_workers, on_update=on_update)
+        scheduler = runner.scheduler
+        self.batch_scheduler = scheduler
+        jobs = runner.run()
+        completed = sum(1 for job in jobs if job.status == DONE)
         
         self.after(0, lambda: self._on_batch_complete(completed))
     
     def _on_batch_complete(self, completed):
         """Called when batch is complete."""
         self.is_mixing = False
+        self.batch_scheduler = None
         self.btn_start.configure(state="normal")
         self.btn_run_batch.configure(state="normal" if self.batch_jobs else "disabled")
         self.progress_bar.set(0)
@@ -675,11 +719,23 @@ class MixitApp(TkinterDnD.Tk):
         
         self._log(self._tr("batch_complete", completed))
         messagebox.showinfo(self._tr("success_title"), self._tr("batch_complete", completed))
-        self._clear_batch()
+        
+        # Finished jobs leave the queue; failed or cancelled ones stay for the next run
+        self.job_manifest.clear(finished_only=True)
+        self.batch_jobs = self.job_manifest.unfinished()
+        self.btn_run_batch.configure(
+            text=self._tr("run_batch", len(self.batch_jobs)),
+            state="normal" if self.batch_jobs else "disabled"
+        )
 
     def _start_mixing(self):
         if self.is_mixing:
-            self._log(self._tr("already_mixing"))
+            if self.cancel_token:
+                # Start button doubles as cancel while a single mix runs
+                self.cancel_token.cancel()
+                self.btn_start.configure(state="disabled")
+            else:
+                self._log(self._tr("already_mixing"))
             return
         
         # Validation
@@ -725,21 +781,27 @@ class MixitApp(TkinterDnD.Tk):
         
         # Start mixing in background thread
         self.is_mixing = True
-        self.btn_start.configure(state="disabled", text=self._tr("mixing"))
+        self.cancel_token = CancelToken()
+        self.btn_start.configure(text=self._tr("cancel"))
         self.progress_bar.set(0)
         
         thread = threading.Thread(
             target=self._run_mix,
-            args=(output_path, target_duration, music_files, smooth_audio, fmt),
+            args=(output_path, target_duration, music_files, smooth_audio, fmt, self.cancel_token),
             daemon=True
         )
         thread.start()
     
-    def _run_mix(self, output_path, target_duration, music_files, smooth_audio, output_format):
+    def _run_mix(self, output_path, target_duration, music_files, smooth_audio, output_format, cancel_token):
         """Run mixing in background thread."""
         try:
-            def progress_callback(line):
-                self._update_progress_from_line(line, target_duration)
+            throttle = Throttle(0.25)
+            
+            def on_progress(event):
+                # Limit Tk event-loop traffic to a few updates per second
+                if throttle.ready(force=event.is_end):
+                    progress = event.fraction(target_duration)
+                    self.after(0, lambda p=progress: self._update_progress_ui(p))
             
             self.engine.render_concat_copy(
                 video_folder=self.video_folder,
@@ -748,43 +810,34 @@ class MixitApp(TkinterDnD.Tk):
                 music_files=music_files,
                 smart_audio=smooth_audio,
                 output_format=output_format,
-                callback=progress_callback
+                cancel_token=cancel_token,
+                on_progress=on_progress
             )
             
             self.after(0, lambda: self._on_mix_complete(True, output_path))
-            
+        
+        except MixCancelled:
+            self.after(0, lambda: self._on_mix_complete(False, None))
         except Exception as ex:
             error_msg = str(ex)
             self.after(0, lambda: self._on_mix_complete(False, error_msg))
     
-    def _update_progress_from_line(self, line, target_duration):
-        """Parse FFmpeg output and update progress bar."""
-        if "time=" in line:
-            try:
-                # Extract time from ffmpeg output
-                time_str = line.split("time=")[1].split()[0]
-                parts = time_str.split(":")
-                if len(parts) == 3:
-                    h, m, s = parts
-                    current_seconds = int(h) * 3600 + int(m) * 60 + float(s)
-                    progress = min(current_seconds / target_duration, 1.0)
-                    
-                    self.after(0, lambda p=progress: self._update_progress_ui(p))
-            except (IndexError, ValueError):
-                pass
-    
     def _update_progress_ui(self, progress):
         """Update progress bar and label."""
         self.progress_bar.set(progress)
         self.lbl_progress.configure(text=self._tr("progress", int(progress * 100)))
     
     def _on_mix_complete(self, success, result):
-        """Called when mixing is complete."""
+        """Called when mixing is complete (result is None if cancelled)."""
         self.is_mixing = False
+        self.cancel_token = None
         self.btn_start.configure(state="normal", text=self._tr("start"))
         self.progress_bar.set(1.0 if success else 0)
         
-        if success:
+        if not success and result is None:
+            self.lbl_progress.configure(text="")
+            self._log(self._tr("cancelled"))
+        elif success:
             self.lbl_progress.configure(text=self._tr("progress", 100))
             self._log(self._tr("success", result))
             messagebox.showinfo(self._tr("success_title"), f"{self._tr('success_msg')}\n\n{result}")
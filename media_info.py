@@ -0,0 +1,173 @@
+"""
+Mixit Media Info
+Compact records built from a single ffprobe -show_format -show_streams call
+"""
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate(rate):
+    """Convert an ffprobe rate string like '30000/1001' to float (None if unknown)."""
+    if not rate:
+        return None
+    try:
+        num, _, den = rate.partition('/')
+        num = float(num)
+        den = float(den) if den else 1.0
+        if num <= 0 or den <= 0:
+            return None
+        return num / den
+    except ValueError:
+        return None
+
+
+class StreamInfo:
+    """One audio/video/other stream of a media file."""
+
+    __slots__ = (
+        'index', 'codec_type', 'codec_name', 'profile',
+        'width', 'height', 'frame_rate', 'pix_fmt', 'time_base',
+        'sample_rate', 'channels', 'channel_layout', 'bit_rate',
+    )
+
+    def __init__(self, index=0, codec_type=None, codec_name=None, profile=None,
+                 width=None, height=None, frame_rate=None, pix_fmt=None, time_base=None,
+                 sample_rate=None, channels=None, channel_layout=None, bit_rate=None):
+        self.index = index
+        self.codec_type = codec_type
+        self.codec_name = codec_name
+        self.profile = profile
+        self.width = width
+        self.height = height
+        self.frame_rate = frame_rate  # exact ffprobe fraction, e.g. '30000/1001'
+        self.pix_fmt = pix_fmt
+        self.time_base = time_base
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.channel_layout = channel_layout
+        self.bit_rate = bit_rate
+
+    @property
+    def fps(self):
+        return parse_rate(self.frame_rate)
+
+    @classmethod
+    def from_ffprobe(cls, stream):
+        frame_rate = stream.get('avg_frame_rate')
+        if not parse_rate(frame_rate):
+            frame_rate = stream.get('r_frame_rate')
+        return cls(
+            index=stream.get('index', 0),
+            codec_type=stream.get('codec_type'),
+            codec_name=stream.get('codec_name'),
+            profile=stream.get('profile'),
+            width=_to_int(stream.get('width')),
+            height=_to_int(stream.get('height')),
+            frame_rate=frame_rate if parse_rate(frame_rate) else None,
+            pix_fmt=stream.get('pix_fmt'),
+            time_base=stream.get('time_base'),
+            sample_rate=_to_int(stream.get('sample_rate')),
+            channels=_to_int(stream.get('channels')),
+            channel_layout=stream.get('channel_layout'),
+            bit_rate=_to_int(stream.get('bit_rate')),
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def __repr__(self):
+        return f"StreamInfo({self.index}, {self.codec_type}, {self.codec_name})"
+
+
+class MediaInfo:
+    """Format-level metadata plus all streams of one media file."""
+
+    __slots__ = ('path', 'duration', 'container', 'bit_rate', 'streams')
+
+    def __init__(self, path, duration=0.0, container=None, bit_rate=None, streams=()):
+        self.path = path
+        self.duration = duration
+        self.container = container
+        self.bit_rate = bit_rate
+        self.streams = tuple(streams)
+
+    @property
+    def video(self):
+        """First video stream, or None."""
+        for stream in self.streams:
+            if stream.codec_type == 'video':
+                return stream
+        return None
+
+    @property
+    def audio(self):
+        """First audio stream, or None."""
+        for stream in self.streams:
+            if stream.codec_type == 'audio':
+                return stream
+        return None
+
+    @property
+    def ok(self):
+        """True if the file could be probed and has a usable duration."""
+        return self.duration > 0
+
+    @classmethod
+    def from_ffprobe(cls, path, data):
+        """Build from the parsed JSON of `ffprobe -show_format -show_streams -of json`."""
+        fmt = data.get('format', {})
+        # Embedded cover art shows up as a video stream; it is not real video
+        streams = [
+            StreamInfo.from_ffprobe(s) for s in data.get('streams', [])
+            if not s.get('disposition', {}).get('attached_pic')
+        ]
+
+        duration = _to_float(fmt.get('duration'))
+        if not duration:
+            stream_durations = [_to_float(s.get('duration')) for s in data.get('streams', [])]
+            duration = max([d for d in stream_durations if d] or [0.0])
+
+        return cls(
+            path=path,
+            duration=duration,
+            container=fmt.get('format_name'),
+            bit_rate=_to_int(fmt.get('bit_rate')),
+            streams=streams,
+        )
+
+    def to_dict(self):
+        return {
+            'duration': self.duration,
+            'container': self.container,
+            'bit_rate': self.bit_rate,
+            'streams': [s.to_dict() for s in self.streams],
+        }
+
+    @classmethod
+    def from_dict(cls, path, data):
+        return cls(
+            path=path,
+            duration=data.get('duration') or 0.0,
+            container=data.get('container'),
+            bit_rate=data.get('bit_rate'),
+            streams=[StreamInfo.from_dict(s) for s in data.get('streams', [])],
+        )
+
+    def __repr__(self):
+        return f"MediaInfo({self.path!r}, {self.duration:.2f}s, {self.container})"
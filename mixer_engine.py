@@ -5,18 +5,101 @@ Core video/audio processing using FFmpeg (Copy Mode Only)
 
 import os
 import random
-import subprocess
+import time
 import tempfile
-from utils import get_media_duration
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from utils import probe_many, probe_media, get_probe_workers, iter_media, within_duration
+from library import VIDEO_EXTENSIONS
+from preflight import preflight, stream_signature, describe_signature
+from normalizer import ClipNormalizer, AudioNormalizer, DEFAULT_AUDIO_BITRATE
+from process_runner import run_process, MixTimeout
+from progress import ProgressParser, ProgressEvent
+from planner import plan_video, iter_plan, PlanEntry, MixPlan
+from plan_cache import PlanCache, library_snapshot
+from keyframes import snap_plan_to_keyframes
+from crossfade import SegmentedCrossfade
+from loudness import loudness_many, track_gain
+from gapless import gapless_entries
+from segments import Checkpoint, split_plan
 from ffmpeg_helper import get_ffmpeg_path
+from file_cache import pinned
+
+# Muxer names for outputs written through the tee muxer
+TEE_FORMATS = {"mp4": "mp4", "mkv": "matroska", "webm": "matroska"}
+
+
+def output_file(output_path, output_format):
+    """Path a render actually writes for output_path in output_format."""
+    if output_format == "webm":
+        # WebM needs re-encoding, but user wants copy mode
+        # Fall back to mkv container which supports more codecs
+        return output_path.rsplit('.', 1)[0] + '.mkv'
+    return output_path
+
+
+def _tee_target(path):
+    """Escape a file name for a tee muxer slave list."""
+    if os.sep == '\\':
+        path = path.replace('\\', '/')
+    else:
+        path = path.replace('\\', '\\\\')
+    for char in '[]|':
+        path = path.replace(char, '\\' + char)
+    return path
 
 
 class MixerEngine:
     def __init__(self):
         self.crossfade_duration = 3.0  # seconds for audio crossfade
+        # Smooth audio: encode only the transitions and stream-copy the rest
+        # (falls back to one acrossfade filter graph for mixed audio formats)
+        self.crossfader = SegmentedCrossfade()
+        self.segmented_crossfade = True
+        # Smooth audio only: level every track to this integrated loudness (LUFS)
+        # with a precomputed gain. None = off. Needs the full re-encode, so the
+        # segmented crossfade is skipped while it is on.
+        self.loudness_target = None
+        # Fast mode: trim encoder delay/padding on packet boundaries (no gaps, no drift)
+        self.gapless_audio = True
+        self.probe_workers = None  # concurrent ffprobe processes (None = auto)
+        # Stream-copy compatibility check: "off", "warn" (report outliers),
+        # "strict" (only mix clips from the dominant signature bucket) or
+        # "normalize" (re-encode outliers once into the normalized clip cache)
+        self.compat_mode = "warn"
+        self.normalizer = ClipNormalizer()
+        # Music outside the dominant audio format is transcoded once (cached)
+        # so stream-copy concat works on mixed libraries
+        self.normalize_music = True
+        self.audio_normalizer = AudioNormalizer()
+        # Optional limits for the ffmpeg run (seconds, None = no limit)
+        self.timeout = None  # total wall-clock time
+        self.stall_timeout = None  # time without any ffmpeg output
+        self.plan_tolerance = 0.5  # max whole-clip overshoot before trimming (seconds)
+        self.keyframe_snap = True  # move trim points onto keyframes (clean copy-mode cuts)
+        # Clip discovery: subfolders, glob filters on the relative path / file name,
+        # and clip length limits in seconds (None = no limit)
+        self.recursive = False
+        self.include = None
+        self.exclude = None
+        self.min_clip_duration = None
+        self.max_clip_duration = None
+        # Streaming render: start ffmpeg at once and feed it clips (as MPEG-TS
+        # on stdin) while the rest of the pool is still being probed
+        self.streaming = False
+        # Long mixes: mux the plan as this many chunks in parallel, checkpointed
+        # next to the output so a failed or cancelled render resumes (1 = off)
+        self.segments = 1
+        self.segment_workers = None  # parallel chunk muxes (None = one per chunk, max cpu count)
+        # Resolved plans by (settings, seed, library snapshot): re-rendering the
+        # same mix skips probing and planning (None = always plan)
+        self.plan_cache = PlanCache()
 
     def render_concat_copy(self, video_folder, output_path, target_duration, 
-                           music_files=None, smart_audio=False, output_format="mp4", callback=None):
+                           music_files=None, smart_audio=False, output_format="mp4", callback=None,
+                           temp_dir=None, cancel_token=None, on_progress=None, seed=None,
+                           extra_outputs=None):
         """
         Ultra Fast Video Mix using stream copy (no re-encoding).
         
@@ -27,148 +110,765 @@ class MixerEngine:
             music_files: List of music file paths (optional)
             smart_audio: If True, apply crossfade between songs (slower)
             output_format: Output format (mp4, mkv, webm)
-            callback: Progress callback function
+            callback: Called with each ffmpeg log line and pre-flight note
+            temp_dir: Parent folder for the per-render workspace
+                      (default: system temp folder)
+            cancel_token: process_runner.CancelToken; cancelling stops ffmpeg,
+                          removes the partial output and raises MixCancelled
+            on_progress: Called with a progress.ProgressEvent about twice a second
+            seed: Seed of every random choice; the same seed, settings and
+                  library give the same mix (default: a random seed)
+            extra_outputs: More (path, format, duration) deliverables of the
+                           same mix, written by the same ffmpeg run (see
+                           render_plan); duration None = the full mix
+        
+        Returns the path of the main output.
         """
-        # --- VIDEO PREP ---
-        video_candidates = [
-            os.path.join(video_folder, f) for f in os.listdir(video_folder) 
-            if f.lower().endswith(('.mp4', '.mov', '.avi', '.mkv'))
-        ]
+        outputs = [(output_path, output_format, None)] + list(extra_outputs or [])
+        if self.streaming:
+            rng = random.Random(seed)
+            audio_mode, selected_music, mix_duration = self._plan_audio(
+                music_files, smart_audio, target_duration, callback, rng, cancel_token
+            )
+            # Planned and probed while ffmpeg is already muxing
+            concat_entries = self._stream_video_plan(video_folder, mix_duration, not music_files, callback, rng)
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            music_paths = [getattr(track, "path", track) for track in selected_music]
+            with self._in_use(music_paths), \
+                    tempfile.TemporaryDirectory(prefix="mixit_", dir=temp_dir, ignore_cleanup_errors=True) as workspace:
+                return self._run_concat(
+                    workspace, concat_entries, audio_mode, selected_music, outputs, mix_duration,
+                    callback, cancel_token, on_progress
+                )[0]
         
-        if not video_candidates:
-            raise ValueError("No video files found.")
+        def make_plan():
+            return self.plan_mix(video_folder, target_duration, music_files, smart_audio, callback, seed, cancel_token)
+        
+        if self.segments > 1:
+            # Without a seed every run plans a new mix, so a resume matches on the settings
+            job = {
+                "settings": self.plan_settings(video_folder, target_duration, music_files, smart_audio),
+                "seed": seed,
+                "output_format": output_format,
+                "segments": self.segments,
+            }
+            return self._render_segmented(
+                job, make_plan, outputs, callback, temp_dir, cancel_token, on_progress
+            )[0]
+        
+        return self.render_plan(make_plan(), output_path, output_format, callback, temp_dir, cancel_token,
+                                on_progress, extra_outputs)
 
-        # Shuffle Video
-        pool = video_candidates.copy()
-        random.shuffle(pool)
-        
-        # Build video list for concat (enough to cover duration)
-        concat_entries = []
-        total_video_duration = 0
-        
-        while total_video_duration < target_duration + 60:  # Buffer
-            for clip in pool:
-                concat_entries.append(clip)
-                total_video_duration += get_media_duration(clip)
-                if total_video_duration >= target_duration + 60:
-                    break
-            if total_video_duration < target_duration:
-                random.shuffle(pool)  # Reshuffle for variety when looping
-        
-        # Write concat list to temp directory
-        temp_dir = tempfile.gettempdir()
-        list_file = os.path.join(temp_dir, "mixit_concat_list.txt")
-        with open(list_file, 'w', encoding='utf-8') as f:
-            for clip in concat_entries:
-                safe_path = clip.replace('\\', '/')
-                f.write(f"file '{safe_path}'\n")
+    def plan_settings(self, video_folder, target_duration, music_files=None, smart_audio=False):
+        """Everything besides the seed and the library that decides a plan."""
+        return {
+            "video_folder": os.path.abspath(video_folder),
+            "target_duration": target_duration,
+            "music_files": [os.path.abspath(track) for track in music_files or []],
+            "smart_audio": smart_audio,
+            "crossfade_duration": self.crossfade_duration,
+            "segmented_crossfade": self._segmented_crossfade(),
+            "normalize_music": self.normalize_music,
+            "gapless_audio": self.gapless_audio,
+            "compat_mode": self.compat_mode,
+            "plan_tolerance": self.plan_tolerance,
+            "keyframe_snap": self.keyframe_snap,
+            "recursive": self.recursive,
+            "include": self.include,
+            "exclude": self.exclude,
+            "min_clip_duration": self.min_clip_duration,
+            "max_clip_duration": self.max_clip_duration,
+        }
 
-        # --- BUILD COMMAND ---
-        cmd = [get_ffmpeg_path(), '-y']
+    def plan_mix(self, video_folder, target_duration, music_files=None, smart_audio=False, callback=None, seed=None,
+                 cancel_token=None):
+        """
+        Resolve a mix without rendering it: songs, clip sequence and trims.
+        Returns a planner.MixPlan for render_plan(). With a seed, a plan with
+        the same settings, seed and library snapshot comes from the plan
+        cache; without one a fresh seed is drawn and the cache is skipped
+        (its key could never match again).
+        Probing, transcoding and analysis stop with MixCancelled once
+        cancel_token fires.
+        """
+        use_cache = self.plan_cache is not None and seed is not None
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        settings = self.plan_settings(video_folder, target_duration, music_files, smart_audio)
+        snapshot = key = None
+        if use_cache:
+            # Walking the library is only worth it when there is a cache to hit
+            snapshot = library_snapshot(video_folder, music_files, self.recursive)
+            key = PlanCache.make_key(settings, seed, snapshot)
+            plan = self.plan_cache.get(key)
+            if plan is not None:
+                print(f"Plan: reusing cached plan (seed {seed})")
+                if callback:
+                    callback(f"Plan: reusing cached plan (seed {seed})\n")
+                return plan
         
-        # Input 0: Video Concat
-        cmd.extend(['-f', 'concat', '-safe', '0', '-i', list_file])
+        rng = random.Random(seed)
+        audio_mode, selected_music, mix_duration = self._plan_audio(
+            music_files, smart_audio, target_duration, callback, rng, cancel_token
+        )
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        entries = self._plan_video(video_folder, mix_duration, not music_files, callback, rng, cancel_token)
+        plan = MixPlan(audio_mode, selected_music, mix_duration, entries, settings, seed, snapshot)
+        if use_cache:
+            self.plan_cache.put(key, plan)
+        return plan
+
+    def render_plan(self, plan, output_path, output_format="mp4", callback=None, temp_dir=None,
+                    cancel_token=None, on_progress=None, extra_outputs=None):
+        """
+        Render a MixPlan from plan_mix() (for example one stored in a job
+        manifest or saved to a file) exactly as planned, without probing or
+        planning again. Returns the path of the main output.
+        
+        extra_outputs: (path, format, duration) tuples for more deliverables
+        of the same plan, such as an MKV copy or a shorter cut (duration in
+        seconds, None = the full mix). Every output is written by one ffmpeg
+        run, so the sources are read only once.
+        """
+        return self.render_outputs(
+            plan, [(output_path, output_format, None)] + list(extra_outputs or []),
+            callback, temp_dir, cancel_token, on_progress
+        )[0]
+
+    def render_outputs(self, plan, outputs, callback=None, temp_dir=None, cancel_token=None, on_progress=None):
+        """
+        Write a MixPlan to several (path, format, duration) outputs in one
+        pass over the sources. Outputs of the same length share one output
+        through the tee muxer; shorter cuts end at their duration (mid-song
+        when it does not fall between songs). Returns the written paths in
+        the order of outputs.
+        """
+        missing = plan.missing()
+        if missing:
+            raise ValueError(f"Plan source not found: {missing[0]}")
+        
+        if self.segments > 1:
+            job = {"plan": plan.to_dict(), "output_format": outputs[0][1], "segments": self.segments}
+            return self._render_segmented(
+                job, lambda: plan, outputs, callback, temp_dir, cancel_token, on_progress
+            )
+        
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        
+        # Each render gets its own workspace, removed on success, failure or cancel
+        with self._in_use(plan.sources()), \
+                tempfile.TemporaryDirectory(prefix="mixit_", dir=temp_dir, ignore_cleanup_errors=True) as workspace:
+            return self._run_concat(
+                workspace, plan.entries, plan.audio_mode, plan.music, outputs, plan.mix_duration,
+                callback, cancel_token, on_progress
+            )
+
+    def _render_segmented(self, job, make_plan, outputs, callback, temp_dir, cancel_token, on_progress):
+        """
+        Long-mix mode: mux the video plan as `segments` chunks in parallel,
+        checkpointed next to the output, then join the chunks with the music
+        in one stream-copy pass. Running the same job again reuses the stored
+        plan and every chunk that already finished, unless files the plan
+        reads have gone (evicted normalized clips or songs): then it is
+        planned again and the checkpoint starts over.
+        self.timeout limits the whole render, not each ffmpeg run.
+        """
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        checkpoint = Checkpoint(outputs[0][0])
+        stored = checkpoint.load(job)
+        plan = MixPlan.from_dict(stored) if stored is not None else None
+        if plan is not None and plan.missing():
+            print(f"Checkpointed plan lost sources, planning again: {plan.missing()[0]}")
+            plan = None
+        if plan is None:
+            plan = make_plan()
+            checkpoint.save(job, plan.to_dict())
+        with self._in_use(plan.sources()):
+            return self._render_chunks(checkpoint, plan, outputs, callback, temp_dir, cancel_token,
+                                       on_progress, deadline)
+
+    def _time_left(self, deadline):
+        """Seconds until deadline (None = no limit); raises MixTimeout once it has passed."""
+        if deadline is None:
+            return None
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise MixTimeout(f"Mix timed out after {self.timeout:g}s")
+        return left
+
+    def _render_chunks(self, checkpoint, plan, outputs, callback, temp_dir, cancel_token, on_progress,
+                       deadline=None):
+        """Mux the chunks of a checkpointed plan that are missing, then join them with the music."""
+        audio_mode, selected_music, mix_duration = plan.audio_mode, plan.music, plan.mix_duration
+        chunks = split_plan(plan.entries, self.segments)
+        
+        ext = ".mp4" if all(fmt == "mp4" for _, fmt, _ in outputs) else ".mkv"
+        done = [i for i in range(len(chunks)) if checkpoint.is_done(i, ext)]
+        line = f"{len(done)}/{len(chunks)} chunk(s) already done" if done else f"{len(chunks)} chunk(s)"
+        print("Segments:", line)
+        if callback:
+            callback(f"Segments: {line}\n")
+        
+        # Chunks fill the first half of the progress bar, the final join the second;
+        # seconds stay the real position within the mix
+        chunk_seconds = {i: sum(entry.length for entry in chunks[i]) for i in done}
+        progress_lock = threading.Lock()
+        started = time.monotonic()
+        first = min(sum(chunk_seconds.values()), mix_duration) / mix_duration / 2 if mix_duration else 0.0
+        
+        def report(seconds, overall, status="continue"):
+            # Time left from the pace since this run started (resumed chunks cost nothing)
+            done_now = overall - first
+            elapsed = time.monotonic() - started
+            remaining = elapsed * (1.0 - overall) / done_now if done_now > 0 else None
+            on_progress(ProgressEvent(out_time_us=int(seconds * 1000000), status=status,
+                                      overall=overall, remaining=remaining))
+        
+        def on_chunk_progress(index, seconds):
+            with progress_lock:
+                chunk_seconds[index] = seconds
+                position = min(sum(chunk_seconds.values()), mix_duration)
+            if on_progress and mix_duration:
+                report(position, position / mix_duration / 2)
         
-        # Audio handling
-        audio_list_file = None
+        def on_join_progress(event):
+            if on_progress and mix_duration:
+                position = min(event.seconds, mix_duration)
+                joined = event.overall if event.overall is not None else position / mix_duration
+                report(position, 0.5 + joined / 2, event.status)
+        
+        with tempfile.TemporaryDirectory(prefix="mixit_", dir=temp_dir, ignore_cleanup_errors=True) as workspace:
+            pending = [i for i in range(len(chunks)) if i not in done]
+            workers = self.segment_workers or min(len(pending), os.cpu_count() or 1)
+            errors = []
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                futures = [
+                    pool.submit(self._mux_chunk, checkpoint, i, chunks[i], ext, audio_mode is None,
+                                workspace, cancel_token, on_chunk_progress, deadline)
+                    for i in pending
+                ]
+                # Let the other chunks finish: everything that completes is kept for a resume
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+            if errors:
+                raise errors[0]
+            
+            chunk_files = [checkpoint.chunk_path(i, ext) for i in range(len(chunks))]
+            result = self._run_concat(
+                workspace, chunk_files, audio_mode, selected_music, outputs, mix_duration,
+                callback, cancel_token, on_join_progress, deadline
+            )
+        
+        checkpoint.clear()
+        return result
+
+    def _mux_chunk(self, checkpoint, index, entries, ext, keep_clip_audio, workspace,
+                   cancel_token=None, on_chunk_progress=None, deadline=None):
+        """Stream-copy one chunk of the plan into the checkpoint folder."""
+        list_file = os.path.join(workspace, f"mixit_chunk_{index:04d}.txt")
+        self._write_concat_list(list_file, entries)
+        temp_path = checkpoint.temp_path(index, ext)
+        
+        cmd = [get_ffmpeg_path(), '-y', '-nostats', '-progress', 'pipe:1',
+               '-f', 'concat', '-safe', '0', '-i', list_file, '-map', '0:v']
+        if keep_clip_audio:
+            cmd.extend(['-map', '0:a?'])
+        cmd.extend(['-c', 'copy', temp_path])
+        
+        parser = ProgressParser()
+        
+        def on_stdout_line(line):
+            event = parser.feed(line)
+            if event and on_chunk_progress:
+                on_chunk_progress(index, event.seconds)
+        
+        try:
+            result = run_process(cmd, on_stdout_line=on_stdout_line, cancel_token=cancel_token,
+                                 timeout=self._time_left(deadline), stall_timeout=self.stall_timeout)
+        except Exception:
+            self._remove_partial_output(temp_path)
+            raise
+        if not result.ok:
+            self._remove_partial_output(temp_path)
+            raise Exception(f"Chunk {index + 1} failed: {result.last_error()}")
+        return checkpoint.commit(temp_path, index, ext)
+
+    def _plan_audio(self, music_files, smart_audio, target_duration, callback=None, rng=None, cancel_token=None):
+        """
+        Choose the songs (music decides the final length: last song plays out).
+        Returns (audio_mode, tracks or concat entries, mix duration);
+        audio_mode is None (keep clip audio), "concat" or "crossfade".
+        """
+        audio_mode = None
+        selected_music = []
+        mix_duration = target_duration
         
         if music_files and len(music_files) > 0:
             if smart_audio and len(music_files) > 1:
-                # --- SMART MODE: Crossfade between songs (AAC encode) ---
-                selected_music, audio_list_file = self._prepare_audio_crossfade(
-                    music_files, target_duration, temp_dir
+                selected_music, mix_duration = self._prepare_audio_crossfade(
+                    music_files, target_duration, rng, cancel_token
                 )
-                
-                if len(selected_music) > 1:
-                    # Build crossfade filter
-                    filter_parts = []
-                    last_label = "[1:a]"
-                    
-                    for i in range(1, len(selected_music)):
-                        next_idx = i + 1
-                        next_label = f"[{next_idx}:a]"
-                        out_label = f"[a{i}]"
-                        filter_parts.append(
-                            f"{last_label}{next_label}acrossfade=d={self.crossfade_duration}:c1=tri:c2=tri{out_label}"
-                        )
-                        last_label = out_label
-                    
-                    # Add all audio inputs
-                    for track in selected_music:
-                        cmd.extend(['-i', track])
-                    
-                    # Add filter and mapping
-                    cmd.extend(['-filter_complex', ';'.join(filter_parts)])
-                    cmd.extend(['-map', '0:v', '-map', last_label])
-                    cmd.extend(['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k'])
-                else:
-                    # Single file, still encode for consistency
-                    cmd.extend(['-i', selected_music[0]])
-                    cmd.extend(['-map', '0:v', '-map', '1:a'])
-                    cmd.extend(['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k'])
+                audio_mode = "crossfade"
+            else:
+                selected_music, mix_duration = self._select_music_for_duration(
+                    music_files, target_duration, rng, cancel_token
+                )
+                audio_mode = "concat"
+            
+            # Copy-joined audio needs one format (the segmented crossfade copies too)
+            if self.normalize_music and (audio_mode == "concat" or self._segmented_crossfade()):
+                selected_music = self._normalize_music(selected_music, callback, cancel_token)
+            
+            if audio_mode == "concat" and self.gapless_audio:
+                selected_music = gapless_entries(selected_music, workers=self.probe_workers, cancel_token=cancel_token)
+        
+        return audio_mode, selected_music, mix_duration
+
+    def _plan_video(self, video_folder, mix_duration, keep_clip_audio, callback=None, rng=None, cancel_token=None):
+        """
+        Probe the clip pool, run pre-flight and plan a clip sequence of exactly
+        mix_duration seconds. Returns list of PlanEntry.
+        """
+        discovered = iter_media(
+            video_folder, VIDEO_EXTENSIONS, recursive=self.recursive,
+            include=self.include, exclude=self.exclude
+        )
+
+        # Probe the pool while the folders are still being walked (parallel, cached)
+        media = probe_many(discovered, workers=self.probe_workers, cancel_token=cancel_token)
+        if not media:
+            raise ValueError("No video files found.")
+
+        pool = sorted(
+            clip for clip, info in media.items()
+            if info.ok and info.video
+            and within_duration(info.duration, self.min_clip_duration, self.max_clip_duration)
+        )
+        
+        if not pool:
+            raise ValueError("No readable video files found.")
+        
+        # Pre-flight: catch codec/resolution mismatches before ffmpeg runs
+        pool = self._preflight_videos(pool, media, keep_clip_audio, callback, cancel_token)
+        
+        # Clip sequence matching the mix length exactly (last clip trimmed)
+        durations = {clip: media[clip].duration for clip in pool}
+        concat_entries = plan_video(pool, durations, mix_duration, tolerance=self.plan_tolerance, rng=rng or random)
+        if self.keyframe_snap:
+            snap_plan_to_keyframes(concat_entries, workers=self.probe_workers, cancel_token=cancel_token)
+        return concat_entries
+
+    def _stream_video_plan(self, video_folder, mix_duration, keep_clip_audio, callback=None, rng=None):
+        """
+        Generator of PlanEntry for a streaming render: clips are probed on a
+        background pool (in random order) and planned as their probes finish.
+        There is no full pool to run pre-flight on yet, so clips must match
+        the first usable clip's stream signature (unless compat_mode is "off").
+        """
+        candidates = list(iter_media(
+            video_folder, VIDEO_EXTENSIONS, recursive=self.recursive,
+            include=self.include, exclude=self.exclude
+        ))
+        if not candidates:
+            raise ValueError("No video files found.")
+        rng = rng or random
+        rng.shuffle(candidates)
+        
+        planned = False
+        probed = self._probe_in_background(candidates, keep_clip_audio, callback)
+        for entry in iter_plan(probed, mix_duration, tolerance=self.plan_tolerance, rng=rng):
+            if self.keyframe_snap and (entry.inpoint or entry.outpoint is not None):
+                snap_plan_to_keyframes([entry])
+            planned = True
+            yield entry
+        
+        if not planned:
+            raise ValueError("No readable video files found.")
+
+    def _probe_in_background(self, candidates, keep_clip_audio, callback=None):
+        """
+        Yield (path, duration) of usable clips in candidate order, each as
+        soon as its probe is done. Probes still run in parallel; keeping the
+        (seeded) candidate order makes a streaming plan reproducible, since
+        the first usable clip fixes the stream signature.
+        """
+        workers = self.probe_workers or get_probe_workers()
+        signature = None
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [pool.submit(probe_media, path) for path in candidates]
+            try:
+                for future in futures:
+                    info = future.result()
+                    if not (info.ok and info.video and
+                            within_duration(info.duration, self.min_clip_duration, self.max_clip_duration)):
+                        continue
+                    clip_signature = stream_signature(info, include_audio=keep_clip_audio)
+                    if signature is None:
+                        signature = clip_signature
+                    elif clip_signature != signature and self.compat_mode != "off":
+                        line = f"Skipping {os.path.basename(info.path)}: {describe_signature(clip_signature)}"
+                        print("Pre-flight:", line)
+                        if callback:
+                            callback(f"Pre-flight: {line}\n")
+                        continue
+                    yield info.path, info.duration
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _run_concat(self, workspace, concat_entries, audio_mode, selected_music, outputs, mix_duration,
+                    callback, cancel_token=None, on_progress=None, deadline=None):
+        """
+        Write the concat lists into workspace, build the ffmpeg command and run it.
+        concat_entries is a list of PlanEntry, or an iterator of them for a
+        streaming render (clips are then fed to ffmpeg's stdin as they come).
+        outputs is a list of (path, format, duration); returns the written paths.
+        deadline (time.monotonic) replaces self.timeout inside a segmented render.
+        """
+        # --- BUILD COMMAND ---
+        # Machine-readable progress on stdout instead of human stats on stderr
+        cmd = [get_ffmpeg_path(), '-y', '-nostats', '-progress', 'pipe:1']
+        
+        # Input 0: Video Concat
+        stdin_writer = None
+        if isinstance(concat_entries, list):
+            list_file = os.path.join(workspace, "mixit_concat_list.txt")
+            self._write_concat_list(list_file, concat_entries)
+            cmd.extend(['-f', 'concat', '-safe', '0', '-i', list_file])
+        else:
+            stdin_writer = self._clip_feeder(concat_entries, audio_mode is None, cancel_token)
+            cmd.extend(['-f', 'mpegts', '-i', 'pipe:0'])
+        
+        # Smooth audio via parallel transition chunks + copied track middles
+        if audio_mode == "crossfade" and self._segmented_crossfade() and len(selected_music) > 1:
+            segments = self.crossfader.render(
+                selected_music, probe_many(selected_music, workers=self.probe_workers, cancel_token=cancel_token),
+                self.crossfade_duration,
+                cancel_token=cancel_token, stall_timeout=self.stall_timeout
+            )
+            if segments:
+                audio_mode, selected_music = "concat", segments
             else:
-                # --- FAST MODE: Concat audio (stream copy) ---
-                selected_music = self._select_music_for_duration(music_files, target_duration)
+                print("Segmented crossfade unavailable, using a single filter graph")
+        
+        # Audio handling: inputs, the audio stream every output maps and its codec
+        audio_filter = None  # (filter graph parts, label of the finished audio)
+        audio_map = ['-map', '1:a']
+        codec_args = ['-c', 'copy']
+        if audio_mode == "crossfade":
+            # --- SMART MODE: Crossfade between songs (AAC encode) ---
+            # Loudness gains ride along with the encode (measured once, cached)
+            gain_filters, labels = self._gain_filters(selected_music, first_input=1, cancel_token=cancel_token)
+            
+            if len(selected_music) > 1:
+                # Build crossfade filter
+                filter_parts = list(gain_filters)
+                last_label = labels[0]
+                curve = self.crossfader.curve
+                
+                for i in range(1, len(selected_music)):
+                    next_label = labels[i]
+                    out_label = f"[a{i}]"
+                    filter_parts.append(
+                        f"{last_label}{next_label}acrossfade=d={self.crossfade_duration}:c1={curve}:c2={curve}{out_label}"
+                    )
+                    last_label = out_label
                 
-                # Write audio concat list
-                audio_list_file = os.path.join(temp_dir, "mixit_audio_concat_list.txt")
-                with open(audio_list_file, 'w', encoding='utf-8') as f:
-                    for track in selected_music:
-                        safe_path = track.replace('\\', '/')
-                        f.write(f"file '{safe_path}'\n")
+                # Add all audio inputs
+                for track in selected_music:
+                    cmd.extend(['-i', track])
                 
-                # Add audio concat input
-                cmd.extend(['-f', 'concat', '-safe', '0', '-i', audio_list_file])
-                cmd.extend(['-map', '0:v', '-map', '1:a', '-c', 'copy'])
+                audio_filter = (filter_parts, last_label)
+            else:
+                # Single file, still encode for consistency
+                cmd.extend(['-i', selected_music[0]])
+                if gain_filters:
+                    audio_filter = (gain_filters, labels[0])
+            codec_args = ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
+        elif audio_mode == "concat":
+            # --- FAST MODE: Concat audio (stream copy) ---
+            audio_list_file = os.path.join(workspace, "mixit_audio_concat_list.txt")
+            self._write_concat_list(audio_list_file, selected_music)
+            
+            # Add audio concat input
+            cmd.extend(['-f', 'concat', '-safe', '0', '-i', audio_list_file])
         else:
             # No music - keep original video audio if exists
-            cmd.extend(['-map', '0:v', '-map', '0:a?', '-c', 'copy'])
-            cmd.extend(['-t', str(target_duration)])
+            audio_map = ['-map', '0:a?']
         
-        # Add shortest flag when we have music (music controls duration)
-        if music_files:
-            cmd.extend(['-shortest'])
+        # One ffmpeg output per distinct length; same-length outputs share it via tee
+        groups = {}
+        seen = set()
+        for path, fmt, duration in outputs:
+            path = output_file(path, fmt)
+            if path in seen:
+                continue  # e.g. a webm and an mkv request both end up as the same mkv
+            seen.add(path)
+            length = min(duration, mix_duration) if duration else mix_duration
+            groups.setdefault(round(length, 3), []).append((path, fmt))
+        groups = sorted(groups.items(), reverse=True)
         
-        # Output format specific settings
-        if output_format == "webm":
-            # WebM needs re-encoding, but user wants copy mode
-            # Fall back to mkv container which supports more codecs
-            output_path = output_path.rsplit('.', 1)[0] + '.mkv'
+        audio_labels = []
+        if audio_filter:
+            filter_parts, label = audio_filter
+            filter_parts = list(filter_parts)
+            if len(groups) > 1:
+                # A filter output feeds one output only: split it per length
+                audio_labels = [f"[out{i}]" for i in range(len(groups))]
+                filter_parts.append(f"{label}asplit={len(groups)}{''.join(audio_labels)}")
+            else:
+                audio_labels = [label]
+            cmd.extend(['-filter_complex', ';'.join(filter_parts)])
+        
+        for i, (length, targets) in enumerate(groups):
+            cmd.extend(['-map', '0:v'])
+            cmd.extend(['-map', audio_labels[i]] if audio_filter else audio_map)
+            cmd.extend(codec_args)
+            if audio_mode:
+                # Add shortest flag when we have music (music controls duration)
+                cmd.append('-shortest')
+            if not audio_mode or length < mix_duration:
+                cmd.extend(['-t', str(length)])
+            if len(targets) == 1:
+                cmd.append(targets[0][0])
+            else:
+                if audio_mode == "crossfade":
+                    # The encoder cannot ask the tee'd muxers whether they need global headers
+                    cmd.extend(['-flags:a', '+global_header'])
+                cmd.extend(['-f', 'tee', '|'.join(
+                    f"[f={TEE_FORMATS.get(fmt, fmt)}]{_tee_target(path)}" for path, fmt in targets
+                )])
         
-        cmd.append(output_path)
+        written = [output_file(path, fmt) for path, fmt, _ in outputs]
+        
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
         
         # Execute
         print("Running:", " ".join(cmd))
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            universal_newlines=True,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        parser = ProgressParser()
+        # Measure progress against the planned length (music decides it), not the requested one
+        length = groups[0][0]
         
-        while True:
-            line = process.stderr.readline()
-            if not line:
-                break
-            if callback:
-                callback(line)
+        def on_stdout_line(line):
+            event = parser.feed(line)
+            if event and on_progress:
+                if length:
+                    event.overall = 1.0 if event.is_end else min(event.seconds / length, 1.0)
+                    event.remaining = max(length - event.seconds, 0.0) / event.speed if event.speed else None
+                on_progress(event)
         
-        process.wait()
+        try:
+            result = run_process(
+                cmd,
+                on_stdout_line=on_stdout_line,
+                on_stderr_line=callback,
+                cancel_token=cancel_token,
+                timeout=self.timeout if deadline is None else self._time_left(deadline),
+                stall_timeout=self.stall_timeout,
+                stdin_writer=stdin_writer
+            )
+        except Exception:
+            # Cancelled, timed out, or the streaming plan failed mid-way
+            for path in written:
+                self._remove_partial_output(path)
+            raise
         
-        # Cleanup temp files
-        self._cleanup_temp_files(list_file, audio_list_file, temp_dir)
+        if not result.ok:
+            for path in written:
+                self._remove_partial_output(path)
+            print(result.stderr_text(20))
+            raise Exception(
+                f"Mix failed: {result.last_error()}\n"
+                "Ensure all audio files have the same codec (e.g., all MP3)."
+            )
         
-        if process.returncode != 0:
-            raise Exception("Mix failed. Ensure all audio files have the same codec (e.g., all MP3).")
+        return written
+
+    def _clip_feeder(self, entries, keep_clip_audio, cancel_token=None):
+        """
+        stdin writer for a streaming render: remux each planned clip to
+        MPEG-TS (stream copy, trimmed, shifted to its place in the mix) and
+        pipe it into the main ffmpeg.
+        """
+        def feed(stdin):
+            offset = 0.0
+            for entry in entries:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                cmd = [get_ffmpeg_path(), '-v', 'error']
+                if entry.inpoint:
+                    cmd.extend(['-ss', f"{entry.inpoint:.6f}"])
+                if entry.outpoint is not None:
+                    cmd.extend(['-to', f"{entry.outpoint:.6f}"])
+                cmd.extend(['-i', entry.path, '-map', '0:v:0'])
+                if keep_clip_audio:
+                    cmd.extend(['-map', '0:a:0?'])
+                cmd.extend([
+                    '-c', 'copy', '-muxdelay', '0', '-muxpreload', '0',
+                    '-output_ts_offset', f"{offset:.6f}", '-f', 'mpegts', 'pipe:1'
+                ])
+                result = run_process(cmd, stdout_sink=stdin, cancel_token=cancel_token)
+                if not result.ok:
+                    raise Exception(f"Could not stream {os.path.basename(entry.path)}: {result.last_error()}")
+                stdin.flush()
+                offset += entry.length
+        return feed
+
+    def _segmented_crossfade(self):
+        """True if smooth audio may use copied track middles (no per-track gain)."""
+        return self.segmented_crossfade and self.loudness_target is None
+
+    def _gain_filters(self, tracks, first_input, cancel_token=None):
+        """
+        volume filters that level tracks to loudness_target.
+        Returns (filter chains, input label per track); tracks that need no
+        gain keep their plain input label.
+        """
+        labels = [f"[{first_input + i}:a]" for i in range(len(tracks))]
+        if self.loudness_target is None:
+            return [], labels
         
-        return output_path
+        loudness = loudness_many(tracks, workers=self.probe_workers, cancel_token=cancel_token)
+        filters = []
+        for i, track in enumerate(tracks):
+            gain = track_gain(loudness.get(track), self.loudness_target)
+            if gain:
+                filters.append(f"{labels[i]}volume={gain}dB[g{i}]")
+                labels[i] = f"[g{i}]"
+        return filters, labels
 
-    def _select_music_for_duration(self, music_files, target_duration):
+    @contextlib.contextmanager
+    def _in_use(self, paths):
+        """
+        Pin a render's sources (normalized clips and songs live in LRU
+        caches) while it runs, then trim the caches to their size caps.
+        """
+        try:
+            with pinned(paths):
+                yield
+        finally:
+            caches = [self.normalizer.cache, self.audio_normalizer.cache, self.crossfader.cache]
+            if self.plan_cache:
+                caches.append(self.plan_cache.files)
+            for cache in caches:
+                cache.evict()
+
+    def _remove_partial_output(self, output_path):
+        """Delete an unfinished output file."""
+        try:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        except OSError:
+            pass  # Ignore cleanup errors
+
+    def _write_concat_list(self, list_file, entries):
+        """
+        Write a concat demuxer list file.
+        entries are paths or planner.PlanEntry (inpoint/outpoint become directives).
+        """
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                path = entry.path if isinstance(entry, PlanEntry) else entry
+                safe_path = path.replace('\\', '/')
+                f.write(f"file '{safe_path}'\n")
+                if isinstance(entry, PlanEntry):
+                    if entry.inpoint:
+                        f.write(f"inpoint {entry.inpoint:.6f}\n")
+                    if entry.outpoint is not None:
+                        f.write(f"outpoint {entry.outpoint:.6f}\n")
+
+    def _preflight_videos(self, pool, media, keep_clip_audio, callback=None, cancel_token=None):
+        """
+        Bucket clips by stream signature and report outliers.
+        In strict mode only the dominant bucket is returned; in normalize
+        mode outliers are swapped for cached re-encodes (media is updated).
+        """
+        if self.compat_mode == "off":
+            return pool
+        
+        report = preflight({clip: media[clip] for clip in pool}, include_audio=keep_clip_audio)
+        if report.is_uniform:
+            return pool
+        
+        for line in report.summary_lines():
+            print("Pre-flight:", line)
+            if callback:
+                callback(f"Pre-flight: {line}\n")
+        
+        if self.compat_mode == "strict":
+            return report.compatible
+        if self.compat_mode == "normalize":
+            return self._normalize_outliers(report, media, keep_clip_audio, callback, cancel_token)
+        return pool
+    
+    def _normalize_outliers(self, report, media, keep_clip_audio, callback=None, cancel_token=None):
+        """
+        Transcode outlier clips to the dominant signature (in parallel, cached).
+        Clips that cannot be converted, or still do not match after the
+        transcode, are left out of the mix.
+        """
+        compatible = report.compatible
+        ext = os.path.splitext(compatible[0])[1].lower()
+        normalized = self.normalizer.normalize_many(report.outliers, report.dominant_signature, ext, cancel_token)
+        
+        converted = [path for path in normalized.values() if path]
+        media.update(probe_many(converted, workers=self.probe_workers, cancel_token=cancel_token))
+        # Stream copy would corrupt the mix at a clip that still differs
+        ready = [
+            path for path in converted
+            if media[path].ok
+            and stream_signature(media[path], include_audio=keep_clip_audio) == report.dominant_signature
+        ]
+        
+        line = f"Normalized {len(ready)}/{len(normalized)} outlier clip(s)"
+        print("Pre-flight:", line)
+        if callback:
+            callback(f"Pre-flight: {line}\n")
+        
+        return compatible + ready
+    
+    def _normalize_music(self, tracks, callback=None, cancel_token=None):
+        """
+        Swap tracks outside the dominant audio format for cached transcodes
+        (in parallel). Tracks that cannot be converted are kept as they are.
+        """
+        unique = list(dict.fromkeys(tracks))
+        media = probe_many(unique, workers=self.probe_workers, cancel_token=cancel_token)
+        report = preflight(media, include_video=False)
+        if report.is_uniform:
+            return tracks
+        
+        lines = report.summary_lines(noun="track")
+        compatible = report.compatible
+        audio_sig = report.dominant_signature[1]
+        bit_rates = [media[track].audio.bit_rate for track in compatible if media[track].audio.bit_rate]
+        bit_rate = max(bit_rates) if bit_rates else DEFAULT_AUDIO_BITRATE
+        ext = os.path.splitext(compatible[0])[1].lower()
+        
+        normalized = self.audio_normalizer.normalize_many(report.outliers, (audio_sig, bit_rate), ext, cancel_token)
+        ready = sum(1 for path in normalized.values() if path)
+        lines.append(f"Normalized {ready}/{len(normalized)} outlier track(s)")
+        for line in lines:
+            print("Pre-flight:", line)
+            if callback:
+                callback(f"Pre-flight: {line}\n")
+        
+        return [normalized.get(track) or track for track in tracks]
+    
+    def _select_music_for_duration(self, music_files, target_duration, rng=None, cancel_token=None):
         """
         Select music files to fill target duration.
         Last song plays completely (natural ending).
+        Returns (tracks, total duration).
         """
+        media = self._probe_music(music_files, cancel_token=cancel_token)
         selected = []
         current_duration = 0
         pool = music_files.copy()
@@ -176,21 +876,22 @@ class MixerEngine:
         while current_duration < target_duration:
             if not pool:
                 pool = music_files.copy()
-                random.shuffle(pool)
+                (rng or random).shuffle(pool)
             
             track = pool.pop(0)
-            dur = get_media_duration(track)
-            if dur > 0:
+            dur = media[track].duration
+            if dur > 0 and media[track].audio:
                 selected.append(track)
                 current_duration += dur
         
-        return selected
+        return selected, current_duration
     
-    def _prepare_audio_crossfade(self, music_files, target_duration, temp_dir):
+    def _prepare_audio_crossfade(self, music_files, target_duration, rng=None, cancel_token=None):
         """
         Prepare audio files for crossfade mixing.
-        Returns list of selected tracks.
+        Returns (tracks, duration of the crossfaded result).
         """
+        media = self._probe_music(music_files, min_duration=self.crossfade_duration + 1, cancel_token=cancel_token)
         selected = []
         current_duration = 0
         pool = music_files.copy()
@@ -201,11 +902,11 @@ class MixerEngine:
         while current_duration < effective_duration:
             if not pool:
                 pool = music_files.copy()
-                random.shuffle(pool)
+                (rng or random).shuffle(pool)
             
             track = pool.pop(0)
-            dur = get_media_duration(track)
-            if dur > self.crossfade_duration + 1:  # Must be longer than crossfade
+            dur = media[track].duration
+            if dur > self.crossfade_duration + 1 and media[track].audio:  # Must be longer than crossfade
                 selected.append(track)
                 # Effective duration accounts for overlap
                 if len(selected) == 1:
@@ -213,14 +914,14 @@ class MixerEngine:
                 else:
                     current_duration += (dur - self.crossfade_duration)
         
-        return selected, None
+        return selected, current_duration
     
-    def _cleanup_temp_files(self, video_list, audio_list, temp_dir):
-        """Clean up temporary files."""
-        try:
-            if video_list and os.path.exists(video_list):
-                os.remove(video_list)
-            if audio_list and os.path.exists(audio_list):
-                os.remove(audio_list)
-        except Exception:
-            pass  # Ignore cleanup errors
+    def _probe_music(self, music_files, min_duration=0, cancel_token=None):
+        """
+        Probe all music files in parallel before selection.
+        Raises if no track is long enough to be used.
+        """
+        media = probe_many(music_files, workers=self.probe_workers, cancel_token=cancel_token)
+        if not any(info.duration > min_duration and info.audio for info in media.values()):
+            raise ValueError("No usable music files found.")
+        return media
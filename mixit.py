@@ -0,0 +1,272 @@
+"""
+Mixit - Headless command line & importable API
+No GUI modules are imported, so this runs on servers without a display.
+
+Usage:
+    python -m mixit VIDEO_FOLDER --duration 60 [--music MUSIC_FOLDER] [--smooth-audio]
+                    [--format mp4|mkv|webm] [--order random|alphabetical|manual]
+                    [--playlist FILE] [--output PATH] [--recursive]
+                    [--include GLOB] [--exclude GLOB] [--min-clip SEC] [--max-clip SEC]
+                    [--loudness LUFS] [--stream] [--segments N]
+                    [--seed N] [--save-plan FILE] [--also FILE] [--cut MINUTES]
+    python -m mixit --plan FILE [--format mp4|mkv|webm] [--output PATH]
+
+Progress is printed to stdout as JSON lines, one event per line:
+    {"event": "start", ...}
+    {"event": "progress", "seconds": 12.5, "progress": 0.0035, "speed": 180.0, "eta": 39.9, ...}
+    {"event": "log", "message": "..."}
+    {"event": "done", "output": "..."}
+    {"event": "error", "message": "..."}
+    {"event": "cancelled", "message": "..."}
+
+SIGTERM/SIGINT cancel the render cleanly (ffmpeg is stopped, partial output removed).
+"""
+
+import os
+import sys
+import json
+import random
+import signal
+import argparse
+import contextlib
+from utils import iter_media, order_playlist
+from library import AUDIO_EXTENSIONS
+from mixer_engine import MixerEngine, output_file
+from plan_cache import load_plan, save_plan
+from process_runner import CancelToken, MixCancelled
+
+
+def load_playlist(playlist_file, music_files):
+    """
+    Order music_files by a text file with one file name per line
+    (same format as the GUI's manual playlist editor).
+    """
+    by_name = {os.path.basename(f): f for f in music_files}
+    ordered = []
+    with open(playlist_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            name = line.strip()
+            if name in by_name:
+                ordered.append(by_name[name])
+    return ordered or music_files
+
+
+def render(video_folder, output_path, duration_minutes, music_folder=None, smooth_audio=False,
+           output_format="mp4", order="random", playlist_file=None, engine=None, callback=None,
+           cancel_token=None, on_progress=None, seed=None, plan_file=None, extra_outputs=None):
+    """
+    Render one mix without the GUI.
+    With plan_file the resolved plan is also written there (see --plan).
+    extra_outputs: (path, format, duration seconds or None) written by the same run.
+    Returns the path of the written file.
+    """
+    engine = engine or MixerEngine()
+
+    music_files = None
+    if music_folder:
+        music_files = list(iter_media(music_folder, AUDIO_EXTENSIONS, recursive=engine.recursive))
+        if playlist_file:
+            music_files = load_playlist(playlist_file, music_files)
+        rng = random.Random(seed) if seed is not None else None
+        music_files = order_playlist(music_files, "manual" if playlist_file else order, rng) or None
+    if plan_file:
+        plan = engine.plan_mix(video_folder, duration_minutes * 60, music_files, smooth_audio, callback, seed,
+                               cancel_token)
+        save_plan(plan, plan_file)
+        return engine.render_plan(plan, output_path, output_format, callback,
+                                  cancel_token=cancel_token, on_progress=on_progress,
+                                  extra_outputs=extra_outputs)
+    return engine.render_concat_copy(
+        video_folder=video_folder,
+        output_path=output_path,
+        target_duration=duration_minutes * 60,
+        music_files=music_files,
+        smart_audio=smooth_audio,
+        output_format=output_format,
+        callback=callback,
+        cancel_token=cancel_token,
+        on_progress=on_progress,
+        seed=seed,
+        extra_outputs=extra_outputs
+    )
+
+
+def extra_outputs_for(output_path, output_format, also=None, cuts=None):
+    """
+    (path, format, duration) of the --also copies (format from the file
+    extension) and the --cut versions of the main output (<name>_<N>min).
+    """
+    outputs = []
+    for path in also or []:
+        fmt = os.path.splitext(path)[1].lower().lstrip('.')
+        if fmt not in ("mp4", "mkv", "webm"):
+            raise ValueError(f"Unsupported output format: {path}")
+        outputs.append((path, fmt, None))
+    base, ext = os.path.splitext(output_path)
+    for minutes in cuts or []:
+        if minutes <= 0:
+            raise ValueError("Cut length must be greater than 0")
+        outputs.append((f"{base}_{minutes:g}min{ext}", output_format, minutes * 60))
+    return outputs
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mixit", description="Mixit - Ultra Fast Video Mixer (headless)")
+    parser.add_argument("video_folder", nargs="?", help="Folder containing video clips")
+    parser.add_argument("-d", "--duration", type=float, help="Target duration in minutes (required unless --plan)")
+    parser.add_argument("-m", "--music", dest="music_folder", help="Folder containing music")
+    parser.add_argument("-s", "--smooth-audio", action="store_true", help="Crossfade between songs")
+    parser.add_argument("-f", "--format", dest="output_format", default="mp4",
+                        choices=["mp4", "mkv", "webm"], help="Output format (default: mp4)")
+    parser.add_argument("--order", default="random", choices=["random", "alphabetical", "manual"],
+                        help="Playlist order (default: random)")
+    parser.add_argument("--playlist", dest="playlist_file",
+                        help="Text file with music file names in play order (implies --order manual)")
+    parser.add_argument("-o", "--output", help="Output file (default: mix_output.<format> in the video folder)")
+    parser.add_argument("--compat", default="warn", choices=["off", "warn", "strict", "normalize"],
+                        help="Stream-copy compatibility check (default: warn)")
+    parser.add_argument("--probe-workers", type=int, default=None, help="Concurrent ffprobe processes")
+    parser.add_argument("--timeout", type=float, default=None, help="Stop ffmpeg after this many seconds")
+    parser.add_argument("--stall-timeout", type=float, default=None,
+                        help="Stop ffmpeg if it produces no output for this many seconds")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Include clips and music in subfolders")
+    parser.add_argument("--include", action="append", metavar="GLOB",
+                        help="Only use clips matching this pattern (file name or relative path; repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB",
+                        help="Skip clips matching this pattern (repeatable)")
+    parser.add_argument("--min-clip", type=float, default=None, metavar="SEC", help="Skip clips shorter than this")
+    parser.add_argument("--max-clip", type=float, default=None, metavar="SEC", help="Skip clips longer than this")
+    parser.add_argument("--loudness", type=float, default=None, metavar="LUFS",
+                        help="With --smooth-audio: level every song to this loudness (e.g. -14)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Start muxing at once and probe the rest of the clips in the background")
+    parser.add_argument("--segments", type=int, default=1, metavar="N",
+                        help="Mux the mix as N parallel chunks; a failed or cancelled run resumes "
+                             "from the finished chunks when started again")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for every random choice: same seed, options and library give the same mix")
+    parser.add_argument("--save-plan", metavar="FILE",
+                        help="Write the resolved plan (songs, clips, trims, seed) to this JSON file")
+    parser.add_argument("--plan", dest="plan_file", metavar="FILE",
+                        help="Render a plan saved with --save-plan without probing or planning again")
+    parser.add_argument("--also", action="append", metavar="FILE",
+                        help="Also write the same mix to this file, format from its extension "
+                             "(same ffmpeg run, sources read once; repeatable)")
+    parser.add_argument("--cut", action="append", type=float, metavar="MINUTES",
+                        help="Also write a cut of this length next to the output as <name>_<N>min "
+                             "(same ffmpeg run; repeatable)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    plan = None
+    if args.plan_file:
+        try:
+            plan = load_plan(args.plan_file)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Cannot read plan {args.plan_file}: {e}", file=sys.stderr)
+            return 2
+        args.video_folder = args.video_folder or plan.settings.get("video_folder")
+        args.duration = plan.mix_duration / 60
+    elif not args.video_folder or args.duration is None:
+        print("A video folder and --duration are required (or --plan FILE)", file=sys.stderr)
+        return 2
+
+    if args.duration <= 0:
+        print("Duration must be greater than 0", file=sys.stderr)
+        return 2
+    if args.save_plan and args.stream:
+        print("--save-plan cannot be combined with --stream", file=sys.stderr)
+        return 2
+
+    output_path = args.output or os.path.join(args.video_folder, f"mix_output.{args.output_format}")
+    try:
+        extra_outputs = extra_outputs_for(output_path, args.output_format, args.also, args.cut)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    out = sys.stdout
+
+    def emit(event, **fields):
+        out.write(json.dumps({"event": event, **fields}) + "\n")
+        out.flush()
+
+    target_seconds = args.duration * 60
+
+    def on_line(line):
+        if line.startswith(("Pre-flight:", "Segments:", "Plan:")):
+            emit("log", message=line.strip())
+    
+    def on_progress(event):
+        # Events carry progress against the planned mix length (music can end
+        # before the target); target_seconds is only a fallback
+        eta = event.eta(target_seconds)
+        emit("progress", seconds=round(event.seconds, 3), progress=round(event.fraction(target_seconds), 4),
+             speed=event.speed, eta=round(eta, 1) if eta is not None else None, frame=event.frame,
+             bitrate=event.bitrate, total_size=event.total_size)
+
+    engine = MixerEngine()
+    engine.compat_mode = args.compat
+    engine.probe_workers = args.probe_workers
+    engine.timeout = args.timeout
+    engine.stall_timeout = args.stall_timeout
+    engine.recursive = args.recursive
+    engine.include = args.include
+    engine.exclude = args.exclude
+    engine.min_clip_duration = args.min_clip
+    engine.max_clip_duration = args.max_clip
+    engine.loudness_target = args.loudness
+    engine.streaming = args.stream
+    engine.segments = args.segments
+    
+    cancel_token = CancelToken()
+    
+    def on_signal(signum, frame):
+        cancel_token.cancel()
+    
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    emit("start", video_folder=args.video_folder, music_folder=args.music_folder,
+         duration=target_seconds, output=output_path)
+    try:
+        # Keep stdout clean for JSON: engine diagnostics go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            if plan is not None:
+                result = engine.render_plan(plan, output_path, args.output_format, on_line,
+                                            cancel_token=cancel_token, on_progress=on_progress,
+                                            extra_outputs=extra_outputs)
+            else:
+                result = render(
+                    video_folder=args.video_folder,
+                    output_path=output_path,
+                    duration_minutes=args.duration,
+                    music_folder=args.music_folder,
+                    smooth_audio=args.smooth_audio,
+                    output_format=args.output_format,
+                    order=args.order,
+                    playlist_file=args.playlist_file,
+                    engine=engine,
+                    callback=on_line,
+                    cancel_token=cancel_token,
+                    on_progress=on_progress,
+                    seed=args.seed,
+                    plan_file=args.save_plan,
+                    extra_outputs=extra_outputs
+                )
+    except MixCancelled as e:
+        emit("cancelled", message=str(e))
+        return 130
+    except Exception as e:
+        emit("error", message=str(e))
+        return 1
+
+    outputs = [result] + [output_file(path, fmt) for path, fmt, _ in extra_outputs]
+    emit("done", output=result, outputs=list(dict.fromkeys(outputs)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
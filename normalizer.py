@@ -0,0 +1,219 @@
+"""
+Mixit Normalizer
+Transcodes clips and music tracks that break stream copy into the dominant
+format, once, and keeps the results in a content-addressed cache for later mixes
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ffmpeg_helper import get_ffmpeg_path
+from process_runner import run_process, MixCancelled
+from utils import wait_result
+from file_cache import FileCache, source_key, GB
+
+# ffprobe codec name -> ffmpeg encoder
+VIDEO_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'mpeg4': 'mpeg4',
+    'vp9': 'libvpx-vp9',
+    'av1': 'libaom-av1',
+}
+
+AUDIO_ENCODERS = {
+    'aac': 'aac',
+    'mp3': 'libmp3lame',
+    'opus': 'libopus',
+    'vorbis': 'libvorbis',
+    'ac3': 'ac3',
+    'flac': 'flac',
+    'pcm_s16le': 'pcm_s16le',
+}
+
+# ffprobe profile name -> encoder -profile:v value
+X264_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+    'High 10': 'high10',
+    'High 4:2:2': 'high422',
+    'High 4:4:4 Predictive': 'high444',
+}
+
+X265_PROFILES = {
+    'Main': 'main',
+    'Main 10': 'main10',
+}
+
+# Encoders where a bitrate makes no sense
+LOSSLESS_AUDIO = ('flac', 'pcm_s16le')
+
+DEFAULT_AUDIO_BITRATE = 192000
+
+
+def get_normalize_workers():
+    """Default number of parallel transcodes (each encoder is multi-threaded itself)."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _time_scale(time_base):
+    """'1/15360' -> '15360'."""
+    if time_base and '/' in time_base:
+        return time_base.split('/', 1)[1]
+    return None
+
+
+class ClipNormalizer:
+    """Re-encodes outlier clips to match a target stream signature."""
+
+    CACHE_NAME = "normalized_clips"
+    KEY_PREFIX = "clip"
+
+    def __init__(self, max_bytes=20 * GB, workers=None):
+        self.cache = FileCache(self.CACHE_NAME, max_bytes=max_bytes)
+        self.workers = workers or get_normalize_workers()
+
+    def can_normalize(self, signature):
+        video_sig, audio_sig = signature
+        if not video_sig or video_sig[0] not in VIDEO_ENCODERS:
+            return False
+        return audio_sig is None or audio_sig[0] in AUDIO_ENCODERS
+
+    def build_command(self, source, output_path, signature):
+        """ffmpeg arguments that convert source to the target signature."""
+        video_sig, audio_sig = signature
+        codec, profile, width, height, frame_rate, pix_fmt, time_base = video_sig
+        encoder = VIDEO_ENCODERS[codec]
+
+        cmd = [get_ffmpeg_path(), '-y', '-v', 'error', '-i', source, '-map', '0:v:0']
+
+        # Letterbox into the target frame instead of stretching
+        filters = []
+        if width and height:
+            filters.append(
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+            )
+        if frame_rate:
+            filters.append(f"fps={frame_rate}")
+        if filters:
+            cmd.extend(['-vf', ','.join(filters)])
+
+        cmd.extend(['-c:v', encoder])
+        if encoder == 'libx264':
+            cmd.extend(['-preset', 'veryfast', '-crf', '18'])
+            if profile in X264_PROFILES:
+                cmd.extend(['-profile:v', X264_PROFILES[profile]])
+        elif encoder == 'libx265':
+            cmd.extend(['-preset', 'fast', '-crf', '20'])
+            if profile in X265_PROFILES:
+                cmd.extend(['-profile:v', X265_PROFILES[profile]])
+        if pix_fmt:
+            cmd.extend(['-pix_fmt', pix_fmt])
+
+        if audio_sig:
+            a_codec, _, sample_rate, channels, _ = audio_sig
+            cmd.extend(['-map', '0:a:0?', '-c:a', AUDIO_ENCODERS[a_codec]])
+            if sample_rate:
+                cmd.extend(['-ar', str(sample_rate)])
+            if channels:
+                cmd.extend(['-ac', str(channels)])
+        else:
+            cmd.append('-an')
+
+        ext = os.path.splitext(output_path)[1].lower()
+        scale = _time_scale(time_base)
+        if scale and ext in ('.mp4', '.mov'):
+            cmd.extend(['-video_track_timescale', scale])
+
+        cmd.append(output_path)
+        return cmd
+
+    def normalize_one(self, source, signature, ext, cancel_token=None):
+        """
+        Return the path of source converted to signature, transcoding only on a cache miss.
+        Returns None if the transcode failed; raises MixCancelled if cancel_token fires.
+        """
+        key = self.cache.make_key(self.KEY_PREFIX, source_key(source), signature)
+        cached = self.cache.lookup(key, ext)
+        if cached:
+            return cached
+
+        temp_path = self.cache.temp_path_for(key, ext)
+        cmd = self.build_command(source, temp_path, signature)
+        try:
+            result = run_process(cmd, cancel_token=cancel_token)
+        except BaseException:
+            self.cache.discard(temp_path)
+            raise
+        if not result.ok:
+            self.cache.discard(temp_path)
+            print(f"Normalize failed for {source}: {result.last_error()}")
+            return None
+        return self.cache.commit(temp_path, key, ext)
+
+    def normalize_many(self, sources, signature, ext, cancel_token=None):
+        """
+        Normalize sources in parallel.
+        Returns dict of source -> normalized path (None for failures).
+        """
+        if not self.can_normalize(signature):
+            return {source: None for source in sources}
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                source: pool.submit(self.normalize_one, source, signature, ext, cancel_token)
+                for source in sources
+            }
+            for source, future in futures.items():
+                try:
+                    results[source] = wait_result(future, cancel_token)
+                except MixCancelled:
+                    for pending in futures.values():
+                        pending.cancel()
+                    raise
+                except OSError as e:
+                    # Source gone since it was probed, or ffmpeg could not start
+                    print(f"Normalize failed for {source}: {e}")
+                    results[source] = None
+        return results
+
+
+class AudioNormalizer(ClipNormalizer):
+    """
+    Re-encodes music tracks to the dominant audio format so the playlist
+    can be joined with stream copy. Signatures are (audio signature, bitrate)
+    pairs; cover art and tags are dropped.
+    """
+
+    CACHE_NAME = "normalized_audio"
+    KEY_PREFIX = "audio"
+
+    def __init__(self, max_bytes=5 * GB, workers=None):
+        # Audio encoders are single-threaded: one per core
+        super().__init__(max_bytes=max_bytes, workers=workers or max(1, os.cpu_count() or 1))
+
+    def can_normalize(self, signature):
+        audio_sig, _ = signature
+        return bool(audio_sig) and audio_sig[0] in AUDIO_ENCODERS
+
+    def build_command(self, source, output_path, signature):
+        """ffmpeg arguments that convert source's first audio stream to the target format."""
+        audio_sig, bit_rate = signature
+        codec, _, sample_rate, channels, _ = audio_sig
+
+        cmd = [
+            get_ffmpeg_path(), '-y', '-v', 'error', '-i', source,
+            '-map', '0:a:0', '-vn', '-map_metadata', '-1',
+            '-c:a', AUDIO_ENCODERS[codec]
+        ]
+        if codec not in LOSSLESS_AUDIO:
+            cmd.extend(['-b:a', str(bit_rate or DEFAULT_AUDIO_BITRATE)])
+        if sample_rate:
+            cmd.extend(['-ar', str(sample_rate)])
+        if channels:
+            cmd.extend(['-ac', str(channels)])
+        cmd.append(output_path)
+        return cmd
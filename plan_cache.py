@@ -0,0 +1,84 @@
+"""
+Mixit Plan Cache
+Resolved MixPlans kept as JSON in the cache folder, keyed by the planning
+settings, the seed and a snapshot of the library they were planned from
+"""
+
+import json
+from file_cache import FileCache, source_key
+from probe_cache import ProbeCache
+from library import VIDEO_EXTENSIONS, get_library_index
+from planner import MixPlan
+
+PLAN_EXT = ".json"
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+
+
+def library_snapshot(video_folder, music_files=None, recursive=False):
+    """Snapshot hash of the clip folder and the music files (see LibraryIndex.snapshot)."""
+    music = []
+    for track in sorted(music_files or []):
+        try:
+            music.append(source_key(track))
+        except FileNotFoundError:
+            music.append([track])
+    clips = get_library_index().snapshot(video_folder, VIDEO_EXTENSIONS, recursive)
+    return FileCache.make_key(clips, music)
+
+
+class PlanCache:
+    """
+    Folder of plan files with the same LRU size cap as the media caches.
+    Each plan is stored with the size and mtime of every source it reads;
+    a plan whose sources have gone (a moved clip, an evicted normalized
+    file) or changed (a clip edited in place) is a miss, so it is planned
+    again.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, root=None):
+        self.files = FileCache("plans", max_bytes=max_bytes, root=root)
+
+    @staticmethod
+    def make_key(settings, seed, snapshot):
+        return FileCache.make_key(settings, seed, snapshot)
+
+    def get(self, key):
+        """Return the cached MixPlan, or None on a miss."""
+        path = self.files.lookup(key, PLAN_EXT)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            plan = MixPlan.from_dict(data["plan"])
+            sources = data["sources"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        for key in sources:
+            current = ProbeCache.file_key(key[0])
+            if current is None or list(current) != key:
+                return None
+        return plan
+
+    def put(self, key, plan):
+        temp = self.files.temp_path_for(key, PLAN_EXT)
+        try:
+            sources = [source_key(path) for path in dict.fromkeys(plan.sources())]
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({"plan": plan.to_dict(), "sources": sources}, f)
+        except OSError as e:
+            print(f"Could not cache plan: {e}")
+            self.files.discard(temp)
+            return None
+        return self.files.commit(temp, key, PLAN_EXT)
+
+
+def load_plan(path):
+    """Read a MixPlan saved with save_plan()."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return MixPlan.from_dict(json.load(f))
+
+
+def save_plan(plan, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(plan.to_dict(), f, indent=1)
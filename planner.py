@@ -0,0 +1,260 @@
+"""
+Mixit Planner
+Chooses the clip sequence for a mix so it matches the target duration exactly
+"""
+
+import os
+import random
+
+# Resolution of the tail subset-sum search (seconds)
+TAIL_STEP = 0.1
+# Max clips considered when filling the tail
+TAIL_CANDIDATES = 64
+
+
+class PlanEntry:
+    """One file in a concat list, optionally trimmed with inpoint/outpoint."""
+
+    __slots__ = ('path', 'duration', 'inpoint', 'outpoint')
+
+    def __init__(self, path, duration, inpoint=None, outpoint=None):
+        self.path = path
+        self.duration = duration  # full duration of the file
+        self.inpoint = inpoint
+        self.outpoint = outpoint
+
+    @property
+    def length(self):
+        """Seconds this entry contributes to the mix."""
+        end = self.outpoint if self.outpoint is not None else self.duration
+        return end - (self.inpoint or 0.0)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["path"], data["duration"], data.get("inpoint"), data.get("outpoint"))
+
+    def __repr__(self):
+        return f"PlanEntry({self.path!r}, {self.inpoint}, {self.outpoint})"
+
+
+def _fill_tail(candidates, durations, remaining, tolerance):
+    """
+    Subset-sum over candidate clips: find whole clips whose total lands in
+    [remaining, remaining + tolerance]. Returns a list of paths or None.
+    """
+    # Sums are bucketed by TAIL_STEP but compared unrounded, so small
+    # clips cannot add up rounding error. Every stored sum is still short
+    # of `remaining`, so the clip that crosses it overshoots by less than
+    # its own length and can always be trimmed.
+    limit = remaining + tolerance
+    # bucket -> (previous bucket, clip index) to rebuild the subset
+    reach = {0: None}
+    totals = {0: 0.0}
+
+    for idx, clip in enumerate(candidates):
+        for bucket in sorted(reach, reverse=True):
+            new_total = totals[bucket] + durations[clip]
+            new_bucket = int(new_total / TAIL_STEP)
+            if new_total > limit or new_bucket in reach:
+                continue
+            reach[new_bucket] = (bucket, idx)
+            totals[new_bucket] = new_total
+            if new_total >= remaining:
+                subset = []
+                while reach[new_bucket] is not None:
+                    new_bucket, i = reach[new_bucket]
+                    subset.append(candidates[i])
+                return list(reversed(subset))
+    return None
+
+
+def plan_video(clips, durations, target_duration, tolerance=0.5, rng=random):
+    """
+    Build a concat plan that covers exactly target_duration seconds.
+
+    Whole clips are taken from a shuffled cycle until the remainder fits
+    inside one clip; the tail is then filled knapsack-style with whole clips
+    (overshooting at most `tolerance`), and the last clip gets an outpoint
+    so ffmpeg never reads past the end of the mix.
+
+    clips: list of paths; durations: dict of path -> seconds.
+    Returns list of PlanEntry.
+    """
+    clips = [clip for clip in clips if durations.get(clip, 0) > 0]
+    if not clips:
+        return []
+
+    longest = max(durations[clip] for clip in clips)
+    entries = []
+    remaining = target_duration
+
+    pool = clips.copy()
+    rng.shuffle(pool)
+    pos = 0
+
+    # Whole clips while the remainder is longer than any single clip
+    while remaining > longest:
+        if pos >= len(pool):
+            rng.shuffle(pool)  # Reshuffle for variety when looping
+            pos = 0
+        clip = pool[pos]
+        pos += 1
+        entries.append(PlanEntry(clip, durations[clip]))
+        remaining -= durations[clip]
+
+    if remaining <= 0:
+        return entries
+
+    # Tail: clips not used in this cycle first, then the ones used longest ago
+    ordered = pool[pos:] + pool[:pos]
+    subset = _fill_tail(ordered[:TAIL_CANDIDATES], durations, remaining, tolerance)
+    if subset is None:
+        # One clip long enough to cover the rest (exists: remaining <= longest)
+        subset = [next(clip for clip in ordered if durations[clip] >= remaining)]
+
+    for clip in subset:
+        entries.append(PlanEntry(clip, durations[clip]))
+        remaining -= durations[clip]
+
+    # Trim the overshoot off the last clip
+    if remaining < 0:
+        last = entries[-1]
+        last.outpoint = round(last.duration + remaining, 3)
+        if last.outpoint <= 0:
+            entries.pop()  # starts within a millisecond of the target
+
+    return entries
+
+
+def iter_plan(probed, target_duration, tolerance=0.5, rng=random):
+    """
+    Streaming form of plan_video for clips that are still being probed.
+
+    probed yields (path, duration) as probes finish. Each clip is passed
+    on at once while the mix is still longer than that clip plus the
+    longest clip seen so far, so a render can start before the pool is
+    fully known. Once probing is done, plan_video finishes the remainder
+    exactly (whole clips, tail fill, trimmed last clip).
+    Yields PlanEntry.
+    """
+    durations = {}
+    longest = 0.0
+    remaining = target_duration
+
+    for path, duration in probed:
+        if duration <= 0:
+            continue
+        durations[path] = duration
+        longest = max(longest, duration)
+        if remaining - duration > longest:
+            remaining -= duration
+            yield PlanEntry(path, duration)
+
+    if remaining > 0 and durations:
+        yield from plan_video(list(durations), durations, remaining, tolerance, rng)
+
+
+def total_length(entries):
+    """Sum of PlanEntry lengths in seconds."""
+    return sum(entry.length for entry in entries)
+
+
+def _encode(item):
+    return item.to_dict() if isinstance(item, PlanEntry) else item
+
+
+def _decode(item):
+    return PlanEntry.from_dict(item) if isinstance(item, dict) else item
+
+
+def _path(item):
+    return item.path if isinstance(item, PlanEntry) else item
+
+
+class MixPlan:
+    """
+    A resolved mix: audio mode (None = keep clip audio, "concat" or
+    "crossfade"), songs (paths or trimmed PlanEntry), final length and the
+    clip sequence, plus what produced it: the planning settings, the seed
+    of every random choice and a snapshot hash of the library.
+
+    The same settings, seed and snapshot always give the same plan, so a
+    plan can be cached, stored, compared and rendered again without
+    probing or planning.
+    """
+
+    def __init__(self, audio_mode, music, mix_duration, entries, settings=None, seed=None, snapshot=None):
+        self.audio_mode = audio_mode
+        self.music = list(music)
+        self.mix_duration = mix_duration
+        self.entries = list(entries)
+        self.settings = settings or {}
+        self.seed = seed
+        self.snapshot = snapshot
+
+    @property
+    def keep_clip_audio(self):
+        return self.audio_mode is None
+
+    def sources(self):
+        """Every file the render reads (songs first, then clips)."""
+        return [_path(item) for item in self.music] + [entry.path for entry in self.entries]
+
+    def missing(self):
+        """Sources that no longer exist (moved clips, evicted cache files)."""
+        return [path for path in dict.fromkeys(self.sources()) if not os.path.isfile(path)]
+
+    def to_dict(self):
+        return {
+            "audio_mode": self.audio_mode,
+            "music": [_encode(item) for item in self.music],
+            "mix_duration": self.mix_duration,
+            "entries": [entry.to_dict() for entry in self.entries],
+            "settings": self.settings,
+            "seed": self.seed,
+            "snapshot": self.snapshot,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["audio_mode"],
+            [_decode(item) for item in data["music"]],
+            data["mix_duration"],
+            [PlanEntry.from_dict(item) for item in data["entries"]],
+            data.get("settings"),
+            data.get("seed"),
+            data.get("snapshot"),
+        )
+
+    def diff(self, other):
+        """Human-readable lines describing how other differs from this plan (empty if equal)."""
+        lines = []
+        for name in ("seed", "snapshot", "audio_mode", "mix_duration"):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if mine != theirs:
+                lines.append(f"{name}: {mine} -> {theirs}")
+        for key in sorted(set(self.settings) | set(other.settings)):
+            mine, theirs = self.settings.get(key), other.settings.get(key)
+            if mine != theirs:
+                lines.append(f"settings.{key}: {mine} -> {theirs}")
+
+        mine = [_encode(item) for item in self.music]
+        theirs = [_encode(item) for item in other.music]
+        if mine != theirs:
+            lines.append(f"music: {len(mine)} -> {len(theirs)} song(s)")
+            lines.extend(f"  - {_path(item)}" for item in self.music if _encode(item) not in theirs)
+            lines.extend(f"  + {_path(item)}" for item in other.music if _encode(item) not in mine)
+
+        mine = [entry.to_dict() for entry in self.entries]
+        theirs = [entry.to_dict() for entry in other.entries]
+        if mine != theirs:
+            changed = sum(1 for a, b in zip(mine, theirs) if a != b) + abs(len(mine) - len(theirs))
+            lines.append(f"clips: {len(mine)} -> {len(theirs)} entries, {changed} position(s) differ")
+        return lines
+
+    def __repr__(self):
+        return f"MixPlan({self.audio_mode!r}, {len(self.music)} song(s), {len(self.entries)} clip(s), {self.mix_duration:.1f}s)"
@@ -0,0 +1,94 @@
+"""
+Mixit Pre-flight
+Groups clips by stream signature so stream-copy concat only gets compatible inputs
+"""
+
+
+def stream_signature(info, include_audio=True, include_video=True):
+    """
+    Return a hashable signature of the parameters that must match
+    for the concat demuxer to stream-copy clips back to back.
+    """
+    v = info.video if include_video else None
+    video_sig = None
+    if v:
+        video_sig = (v.codec_name, v.profile, v.width, v.height, v.frame_rate, v.pix_fmt, v.time_base)
+
+    audio_sig = None
+    a = info.audio
+    if include_audio and a:
+        audio_sig = (a.codec_name, a.profile, a.sample_rate, a.channels, a.channel_layout)
+
+    return (video_sig, audio_sig)
+
+
+def describe_signature(signature):
+    """Human readable form of a stream signature."""
+    video_sig, audio_sig = signature
+    parts = []
+    if video_sig:
+        codec, profile, width, height, rate, pix_fmt, time_base = video_sig
+        parts.append(f"{codec} {profile or ''} {width}x{height} @{rate} {pix_fmt} tb={time_base}".replace('  ', ' '))
+    elif not audio_sig:
+        parts.append("no video")
+    if audio_sig:
+        codec, profile, sample_rate, channels, layout = audio_sig
+        parts.append(f"{codec} {sample_rate}Hz {layout or channels}")
+    return " | ".join(parts)
+
+
+class PreflightReport:
+    """
+    Result of bucketing clips by stream signature.
+    Buckets are sorted largest first; the first one is the dominant bucket.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets  # list of (signature, [paths])
+
+    @property
+    def dominant_signature(self):
+        return self.buckets[0][0] if self.buckets else None
+
+    @property
+    def compatible(self):
+        """Clips that can be stream-copied together with the dominant bucket."""
+        return list(self.buckets[0][1]) if self.buckets else []
+
+    @property
+    def outliers(self):
+        """Clips that do not match the dominant bucket."""
+        return [path for _, paths in self.buckets[1:] for path in paths]
+
+    @property
+    def is_uniform(self):
+        return len(self.buckets) <= 1
+
+    def summary_lines(self, noun="clip"):
+        """Short report, one line per bucket."""
+        lines = []
+        for i, (signature, paths) in enumerate(self.buckets):
+            tag = "dominant" if i == 0 else "outlier"
+            lines.append(f"[{tag}] {len(paths)} {noun}(s): {describe_signature(signature)}")
+        return lines
+
+
+def preflight(media, include_audio=True, include_video=True):
+    """
+    Bucket clips by stream signature.
+    media: dict of path -> MediaInfo (as returned by utils.probe_many).
+    include_audio: compare audio streams too (only matters when clip audio is kept).
+    include_video: compare video streams (off for music, where cover art is ignored).
+    """
+    groups = {}
+    for path, info in media.items():
+        signature = stream_signature(info, include_audio, include_video)
+        groups.setdefault(signature, []).append(path)
+
+    # Largest bucket first; ties broken by total duration so long clips win
+    buckets = sorted(
+        groups.items(),
+        key=lambda item: (len(item[1]), sum(media[p].duration for p in item[1])),
+        reverse=True
+    )
+    return PreflightReport(buckets)
@@ -0,0 +1,184 @@
+"""
+Mixit Probe Cache
+Persistent ffprobe results keyed by absolute path, file size and mtime
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from ffmpeg_helper import get_cache_dir
+
+DEFAULT_MAX_ENTRIES = 50000
+# Cache hits whose last_used is written back in one go
+TOUCH_BATCH = 256
+
+
+class ProbeCache:
+    """
+    SQLite-backed store for probe results.
+
+    Every entry remembers the size and mtime of the file it was probed from,
+    so a changed file is a miss and its stale entry is dropped. The least
+    recently used entries are evicted once max_entries is exceeded.
+    Hits only note the time in memory; last_used is written back in
+    batches (on put, stats, flush, or every TOUCH_BATCH hits), so a warm
+    run does not pay a write per lookup.
+    """
+
+    def __init__(self, db_path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), "probe_cache.sqlite3")
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # (path, kind) -> last_used not yet written
+        self._lock = threading.Lock()
+        self._conn = self._connect(db_path)
+
+    def _connect(self, db_path):
+        try:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            # Unwritable cache folder: keep working with a throwaway cache
+            print(f"Probe cache unavailable ({e}), using memory only")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            " path TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (path, kind))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def file_key(file_path):
+        """Return (absolute path, size, mtime_ns) or None if the file is missing."""
+        path = os.path.abspath(file_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return path, st.st_size, st.st_mtime_ns
+
+    def get(self, file_path, kind="duration"):
+        """Return the cached value for file_path, or None on a miss."""
+        key = self.file_key(file_path)
+        if key is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        path, size, mtime_ns = key
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, data FROM probes WHERE path = ? AND kind = ?",
+                (path, kind)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            if row[0] != size or row[1] != mtime_ns:
+                # File changed since it was probed
+                self._conn.execute("DELETE FROM probes WHERE path = ? AND kind = ?", (path, kind))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._touched[(path, kind)] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+            self.hits += 1
+            return json.loads(row[2])
+
+    def put(self, file_path, kind, value):
+        """Store a JSON-serializable value for file_path."""
+        key = self.file_key(file_path)
+        if key is None:
+            return
+        path, size, mtime_ns = key
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes (path, kind, size, mtime_ns, data, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, kind, size, mtime_ns, json.dumps(value), time.time())
+            )
+            self._touched.pop((path, kind), None)
+            self._flush_touched()
+            self._evict()
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """Write the pending last_used times of cache hits (lock held)."""
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            self._conn.executemany(
+                "UPDATE probes SET last_used = ? WHERE path = ? AND kind = ?",
+                [(last_used, path, kind) for (path, kind), last_used in touched.items()]
+            )
+
+    def flush(self):
+        """Write pending last_used times to disk."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries above max_entries (lock held)."""
+        count = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM probes WHERE rowid IN "
+                "(SELECT rowid FROM probes ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            entries = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM probes")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_probe_cache():
+    """Return the shared process-wide ProbeCache."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ProbeCache()
+            atexit.register(_default_cache.flush)
+        return _default_cache
@@ -0,0 +1,243 @@
+"""
+Mixit Process Runner
+One place to run ffmpeg/ffprobe: every pipe is drained or sent to DEVNULL,
+stderr is kept in a bounded ring buffer, and runs can be cancelled or time-limited
+"""
+
+import time
+import threading
+import subprocess
+from collections import deque
+from ffmpeg_helper import NO_WINDOW
+
+DEFAULT_STDERR_LINES = 200
+
+
+class MixCancelled(Exception):
+    """Raised when a render was cancelled through its CancelToken."""
+
+
+class MixTimeout(Exception):
+    """Raised when a render exceeded its wall-clock or stall timeout."""
+
+
+class CancelToken:
+    """Thread-safe flag shared between whoever starts a render and whoever may stop it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block until cancelled or timeout; returns True if cancelled."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise MixCancelled("Mix cancelled.")
+
+
+def terminate_process(process, grace=5.0):
+    """Ask a process to stop, and kill it if it does not exit within grace seconds."""
+    if process.poll() is not None:
+        return
+    try:
+        process.terminate()
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    except OSError:
+        pass
+
+
+class ProcessWatchdog(threading.Thread):
+    """
+    Stops a running process when its CancelToken fires, when it runs longer
+    than `timeout` seconds, or when no output arrives for `stall_timeout`
+    seconds. Call touch() whenever the process produces output.
+    After the process exits, `reason` tells why it was stopped (or None).
+    """
+
+    def __init__(self, process, cancel_token=None, timeout=None, stall_timeout=None, poll_interval=0.25):
+        super().__init__(daemon=True)
+        self.process = process
+        self.cancel_token = cancel_token
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.poll_interval = poll_interval
+        self.reason = None
+        self._start_time = time.monotonic()
+        self._last_output = self._start_time
+
+    def touch(self):
+        self._last_output = time.monotonic()
+
+    def run(self):
+        while self.process.poll() is None:
+            now = time.monotonic()
+            if self.cancel_token and self.cancel_token.cancelled:
+                self.reason = "cancelled"
+            elif self.timeout and now - self._start_time > self.timeout:
+                self.reason = f"timed out after {self.timeout:g}s"
+            elif self.stall_timeout and now - self._last_output > self.stall_timeout:
+                self.reason = f"stalled (no output for {self.stall_timeout:g}s)"
+
+            if self.reason:
+                terminate_process(self.process)
+                return
+            time.sleep(self.poll_interval)
+
+    def raise_if_stopped(self):
+        """Raise MixCancelled/MixTimeout if the watchdog stopped the process."""
+        if self.reason == "cancelled":
+            raise MixCancelled("Mix cancelled.")
+        if self.reason:
+            raise MixTimeout(f"Mix {self.reason}.")
+
+
+class ProcessResult:
+    """Outcome of run_process()."""
+
+    __slots__ = ('returncode', 'stdout', 'stderr_tail')
+
+    def __init__(self, returncode, stdout, stderr_tail):
+        self.returncode = returncode
+        self.stdout = stdout  # full text if capture_stdout, else None
+        self.stderr_tail = stderr_tail  # last stderr lines (bounded)
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def stderr_text(self, lines=None):
+        tail = self.stderr_tail[-lines:] if lines else self.stderr_tail
+        return "\n".join(tail)
+
+    def last_error(self):
+        """Last non-empty stderr line, handy for short error messages."""
+        for line in reversed(self.stderr_tail):
+            if line.strip():
+                return line.strip()
+        return f"exit code {self.returncode}"
+
+
+class ProcessError(Exception):
+    """A process exited with a non-zero code; .result holds the stderr tail."""
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+
+def run_process(cmd, on_stdout_line=None, on_stderr_line=None, capture_stdout=False,
+                cancel_token=None, timeout=None, stall_timeout=None,
+                stderr_lines=DEFAULT_STDERR_LINES, stdin_writer=None, stdout_sink=None):
+    """
+    Run a command to completion without pipe deadlocks.
+
+    stdout is read line by line (on_stdout_line / capture_stdout), copied as
+    raw bytes into the binary file stdout_sink, or discarded; stderr is
+    drained on its own thread into a ring buffer of the last `stderr_lines`
+    lines (and passed to on_stderr_line). stdin is closed unless
+    stdin_writer is given: it is called on its own thread with the binary
+    stdin pipe, which is closed when it returns. If it raises, the process
+    is stopped and the exception is re-raised here.
+    Raises MixCancelled / MixTimeout if the watchdog stopped the process,
+    otherwise returns a ProcessResult (callers check .ok).
+    """
+    want_stdout = capture_stdout or on_stdout_line is not None or stdout_sink is not None
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if stdin_writer else subprocess.DEVNULL,
+        stdout=subprocess.PIPE if want_stdout else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        encoding='utf-8',
+        errors='replace',
+        creationflags=NO_WINDOW
+    )
+
+    watchdog = None
+    if cancel_token or timeout or stall_timeout:
+        watchdog = ProcessWatchdog(process, cancel_token, timeout, stall_timeout)
+        watchdog.start()
+
+    stderr_tail = deque(maxlen=stderr_lines)
+
+    def drain_stderr():
+        for line in process.stderr:
+            if watchdog:
+                watchdog.touch()
+            stderr_tail.append(line.rstrip('\r\n'))
+            if on_stderr_line:
+                on_stderr_line(line)
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    writer_errors = []
+
+    def write_stdin():
+        try:
+            stdin_writer(process.stdin.buffer)
+        except BrokenPipeError:
+            pass  # the process stopped reading; its exit code tells why
+        except BaseException as e:
+            writer_errors.append(e)
+            terminate_process(process)
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    writer_thread = None
+    if stdin_writer:
+        writer_thread = threading.Thread(target=write_stdin, daemon=True)
+        writer_thread.start()
+
+    stdout_chunks = [] if capture_stdout else None
+    try:
+        if stdout_sink is not None:
+            raw = process.stdout.buffer
+            while True:
+                chunk = raw.read1(65536)
+                if not chunk:
+                    break
+                if watchdog:
+                    watchdog.touch()
+                stdout_sink.write(chunk)
+        elif want_stdout:
+            for line in process.stdout:
+                if watchdog:
+                    watchdog.touch()
+                if capture_stdout:
+                    stdout_chunks.append(line)
+                if on_stdout_line:
+                    on_stdout_line(line)
+        process.wait()
+    finally:
+        # Never leave the child running behind an exception
+        terminate_process(process)
+        stderr_thread.join()
+        if writer_thread:
+            writer_thread.join()
+        if watchdog:
+            watchdog.join()
+
+    if watchdog:
+        watchdog.raise_if_stopped()
+    if writer_errors:
+        raise writer_errors[0]
+
+    return ProcessResult(
+        process.returncode,
+        "".join(stdout_chunks) if capture_stdout else None,
+        list(stderr_tail)
+    )
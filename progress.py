@@ -0,0 +1,130 @@
+"""
+Mixit Progress
+Typed events parsed from ffmpeg's machine-readable `-progress` stream
+"""
+
+import time
+
+
+def _number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _clock_to_us(value):
+    """'00:01:02.500000' -> microseconds."""
+    try:
+        h, m, s = value.split(':')
+        return int((int(h) * 3600 + int(m) * 60 + float(s)) * 1000000)
+    except (AttributeError, ValueError):
+        return None
+
+
+class ProgressEvent:
+    """
+    One block of ffmpeg -progress output (emitted about twice a second).
+    The engine sets overall and remaining: the fraction of the whole
+    render and the seconds left, measured against the planned mix length
+    (and across every pass of a segmented render), while out_time_us
+    stays the position within the mix.
+    """
+
+    __slots__ = ('frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'speed', 'status',
+                 'overall', 'remaining')
+
+    def __init__(self, frame=None, fps=None, bitrate=None, total_size=None,
+                 out_time_us=None, speed=None, status="continue", overall=None, remaining=None):
+        self.frame = frame
+        self.fps = fps
+        self.bitrate = bitrate  # kbit/s
+        self.total_size = total_size  # bytes written so far
+        self.out_time_us = out_time_us
+        self.speed = speed  # x realtime
+        self.status = status  # "continue" or "end"
+        self.overall = overall  # 0.0 - 1.0 of a multi-pass render, or None
+        self.remaining = remaining  # seconds left of a multi-pass render, or None
+
+    @property
+    def seconds(self):
+        """Output position in seconds."""
+        return (self.out_time_us or 0) / 1000000.0
+
+    @property
+    def is_end(self):
+        return self.status == "end"
+
+    def fraction(self, target_duration):
+        """Progress towards target_duration as 0.0 - 1.0."""
+        if self.overall is not None:
+            return min(self.overall, 1.0)
+        if not target_duration:
+            return 0.0
+        return min(self.seconds / target_duration, 1.0)
+
+    def eta(self, target_duration):
+        """Estimated seconds left, or None while speed is unknown."""
+        if self.overall is not None:
+            return self.remaining
+        if not self.speed or not target_duration:
+            return None
+        return max(target_duration - self.seconds, 0.0) / self.speed
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ProgressParser:
+    """
+    Turns the key=value lines of `ffmpeg -progress pipe:1` into ProgressEvents.
+    feed() returns an event when a block is complete (on its 'progress=' line).
+    """
+
+    def __init__(self):
+        self._fields = {}
+
+    def feed(self, line):
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        value = value.strip()
+        if key != 'progress':
+            self._fields[key] = value
+            return None
+
+        fields, self._fields = self._fields, {}
+
+        out_time_us = _number(fields.get('out_time_us'), int)
+        if out_time_us is None:
+            # Older builds: out_time_ms is (despite its name) in microseconds
+            out_time_us = _number(fields.get('out_time_ms'), int)
+        if out_time_us is None:
+            out_time_us = _clock_to_us(fields.get('out_time'))
+
+        bitrate = fields.get('bitrate', '')
+        speed = fields.get('speed', '')
+        return ProgressEvent(
+            frame=_number(fields.get('frame'), int),
+            fps=_number(fields.get('fps')),
+            bitrate=_number(bitrate.replace('kbits/s', '')),
+            total_size=_number(fields.get('total_size'), int),
+            out_time_us=out_time_us,
+            speed=_number(speed.rstrip('x')),
+            status=value,
+        )
+
+
+class Throttle:
+    """Lets a call through at most once per `interval` seconds."""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self._last = 0.0
+
+    def ready(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
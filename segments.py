@@ -0,0 +1,79 @@
+"""
+Mixit Segments
+Splits a long mix into chunks that are muxed in parallel and checkpointed
+next to the output, so a failed or cancelled render resumes where it stopped
+"""
+
+import os
+import json
+import shutil
+
+CHECKPOINT_SUFFIX = ".mixit-parts"
+STATE_FILE = "plan.json"
+
+
+def split_plan(entries, count):
+    """Split entries into at most `count` consecutive chunks of similar length."""
+    total = sum(entry.length for entry in entries)
+    chunks = []
+    current = []
+    done = 0.0
+    for entry in entries:
+        current.append(entry)
+        done += entry.length
+        if len(chunks) < count - 1 and done >= total * (len(chunks) + 1) / count:
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Checkpoint:
+    """
+    Folder next to the output with the resolved plan (plan.json) and every
+    finished chunk. A render of the same job picks up the stored plan and
+    only muxes the chunks that are missing.
+    """
+
+    def __init__(self, output_path):
+        self.root = output_path + CHECKPOINT_SUFFIX
+
+    def load(self, job):
+        """Return the stored plan (MixPlan.to_dict form) if it belongs to job, else None."""
+        try:
+            with open(os.path.join(self.root, STATE_FILE), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("job") != job:
+            return None
+        return state.get("plan")
+
+    def save(self, job, plan):
+        """Start a fresh checkpoint (older chunks are dropped)."""
+        self.clear()
+        os.makedirs(self.root, exist_ok=True)
+        state = {"job": job, "plan": plan}
+        temp = os.path.join(self.root, STATE_FILE + ".part")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1)
+        os.replace(temp, os.path.join(self.root, STATE_FILE))
+
+    def chunk_path(self, index, ext):
+        return os.path.join(self.root, f"chunk_{index:04d}{ext}")
+
+    def temp_path(self, index, ext):
+        return os.path.join(self.root, f"chunk_{index:04d}.part{ext}")
+
+    def is_done(self, index, ext):
+        return os.path.isfile(self.chunk_path(index, ext))
+
+    def commit(self, temp_path, index, ext):
+        """Mark a chunk finished by moving it into place."""
+        path = self.chunk_path(index, ext)
+        os.replace(temp_path, path)
+        return path
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import probe_cache
+from crossfade import AudioFormat, SegmentedCrossfade
+from media_info import MediaInfo, StreamInfo
+from planner import PlanEntry
+from probe_cache import ProbeCache
+
+
+def song(path, duration, codec='mp3', sample_rate=44100, channels=2, bit_rate=192000):
+    stream = StreamInfo(0, 'audio', codec, sample_rate=sample_rate, channels=channels, bit_rate=bit_rate)
+    return MediaInfo(path, duration, 'mp3', streams=[stream])
+
+
+class CrossfadeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.saved_env = os.environ.get('MIXIT_CACHE_DIR')
+        os.environ['MIXIT_CACHE_DIR'] = self.tmp
+        self.crossfade = SegmentedCrossfade(workers=2)
+
+    def tearDown(self):
+        if self.saved_env is None:
+            os.environ.pop('MIXIT_CACHE_DIR', None)
+        else:
+            os.environ['MIXIT_CACHE_DIR'] = self.saved_env
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class CutPointsTest(CrossfadeTestCase):
+
+    def test_frame_aligned(self):
+        fmt = AudioFormat('mp3', 44100, 2, 192000)
+        frame = 1152 / 44100
+        head, tail = self.crossfade.cut_points(180.0, 3.0, fmt)
+        self.assertAlmostEqual(head / frame, round(head / frame), places=3)
+        self.assertAlmostEqual(tail / frame, round(tail / frame), places=3)
+        self.assertGreaterEqual(head, 3.0)
+        self.assertLess(head - 3.0, frame)
+        self.assertLessEqual(tail, 177.0)
+        self.assertLess(177.0 - tail, frame)
+
+    def test_aac_frames(self):
+        fmt = AudioFormat('aac', 48000, 2, 192000)
+        head, tail = self.crossfade.cut_points(60.0, 2.0, fmt)
+        self.assertEqual(head, round(94 * 1024 / 48000, 6))
+        self.assertEqual(tail, round(2718 * 1024 / 48000, 6))
+
+    def test_short_track(self):
+        fmt = AudioFormat('mp3', 44100, 2, 192000)
+        head, tail = self.crossfade.cut_points(5.0, 3.0, fmt)
+        self.assertLessEqual(tail, head)
+
+
+class AudioFormatTest(CrossfadeTestCase):
+
+    def test_shared_format(self):
+        media = {"a": song("a", 100.0), "b": song("b", 120.0)}
+        fmt = self.crossfade.audio_format(["a", "b"], media)
+        self.assertEqual((fmt.codec, fmt.sample_rate, fmt.channels, fmt.ext), ('mp3', 44100, 2, '.mp3'))
+
+    def test_mixed_formats(self):
+        for other in (song("b", 120.0, codec='aac'), song("b", 120.0, sample_rate=48000),
+                      song("b", 120.0, channels=1), MediaInfo("b", 120.0)):
+            media = {"a": song("a", 100.0), "b": other}
+            self.assertIsNone(self.crossfade.audio_format(["a", "b"], media))
+        self.assertIsNone(self.crossfade.audio_format(["a"], {"a": song("a", 100.0, codec='flac')}))
+
+    def test_pair_format_takes_higher_bitrate(self):
+        fmt = AudioFormat('mp3', 44100, 2, 128000)
+        pair = self.crossfade.pair_format(fmt, song("a", 1, bit_rate=256000).audio, song("b", 1).audio)
+        self.assertEqual(pair.bit_rate, 256000)
+
+    @mock.patch('crossfade.get_ffmpeg_path', return_value='ffmpeg')
+    def test_build_command(self, _):
+        fmt = AudioFormat('aac', 48000, 2, 192000)
+        cmd = self.crossfade.build_command("a.m4a", 57.0, "b.m4a", 2.0, 2.0, fmt, "out.m4a")
+        self.assertEqual(cmd[cmd.index('-ss') + 1], "57.000000")
+        self.assertEqual(cmd[cmd.index('-t') + 1], "2.000000")
+        self.assertIn("acrossfade=d=2.0:c1=tri:c2=tri", cmd[cmd.index('-filter_complex') + 1])
+        self.assertEqual(cmd[cmd.index('-c:a') + 1], 'aac')
+        self.assertEqual(cmd[-1], "out.m4a")
+
+
+class PrerenderedCrossfade(SegmentedCrossfade):
+    """Returns ready-made chunk files instead of running ffmpeg."""
+
+    def __init__(self, chunks, **kwargs):
+        super().__init__(**kwargs)
+        self.chunks = chunks
+
+    def render_transition(self, track_a, tail_a, track_b, head_b, crossfade, fmt,
+                          cancel_token=None, stall_timeout=None):
+        return self.chunks[(track_a, track_b)]
+
+
+class RenderTest(CrossfadeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.saved_cache = probe_cache._default_cache
+        probe_cache._default_cache = self.cache = ProbeCache(os.path.join(self.tmp, "probe_cache.sqlite3"))
+
+    def tearDown(self):
+        probe_cache._default_cache = self.saved_cache
+        self.cache._conn.close()
+        super().tearDown()
+
+    def touch(self, name):
+        path = os.path.join(self.tmp, name)
+        open(path, 'wb').close()
+        return path
+
+    def test_chunks_are_trimmed(self):
+        tracks = [self.touch(f"song{i}.mp3") for i in range(3)]
+        media = {track: song(track, 100.0 + i) for i, track in enumerate(tracks)}
+        chunks = {(tracks[0], tracks[1]): self.touch("x01.mp3"), (tracks[1], tracks[2]): self.touch("x12.mp3")}
+        frame = 1152 / 44100
+        # Priming of 1105 samples and 700 samples of padding, as LAME writes them
+        self.cache.put(chunks[(tracks[0], tracks[1])], "gapless", {
+            "start": 0.0, "end": 240 * frame, "frame": frame, "delay": 1105, "padding": 700, "sample_rate": 44100,
+        })
+        # No packet info for the second chunk: it is passed through untrimmed
+
+        entries = PrerenderedCrossfade(chunks, workers=2).render(tracks, media, 3.0)
+        self.assertEqual(len(entries), 5)
+        self.assertEqual([entry.path for entry in entries[0::2]], tracks)
+        self.assertIsNone(entries[0].inpoint)
+        self.assertIsNone(entries[4].outpoint)
+
+        chunk = entries[1]
+        self.assertIsInstance(chunk, PlanEntry)
+        self.assertEqual(chunk.path, chunks[(tracks[0], tracks[1])])
+        self.assertEqual(chunk.inpoint, round(frame, 6))
+        self.assertEqual(chunk.outpoint, round(239 * frame, 6))
+        self.assertEqual(entries[3], chunks[(tracks[1], tracks[2])])
+
+    def test_failed_chunk(self):
+        tracks = [self.touch("a.mp3"), self.touch("b.mp3")]
+        media = {track: song(track, 100.0) for track in tracks}
+        self.assertIsNone(PrerenderedCrossfade({(tracks[0], tracks[1]): None}).render(tracks, media, 3.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from gapless import _parse_packets, trim_points
+
+RATE = 44100
+FRAME = 1152 / RATE
+
+
+def info(packets=100, start=0.0, delay=0, padding=0):
+    return {
+        "start": start,
+        "end": start + packets * FRAME,
+        "frame": FRAME,
+        "delay": delay,
+        "padding": padding,
+        "sample_rate": RATE,
+    }
+
+
+class TrimPointsTest(unittest.TestCase):
+
+    def test_priming_and_padding(self):
+        inpoint, outpoint = trim_points(info(delay=1105, padding=700))
+        self.assertEqual(inpoint, round(FRAME, 6))
+        self.assertEqual(outpoint, round(99 * FRAME, 6))
+
+    def test_no_priming(self):
+        inpoint, outpoint = trim_points(info())
+        self.assertIsNone(inpoint)
+        self.assertEqual(outpoint, round(100 * FRAME, 6))
+
+    def test_edit_list_start(self):
+        # Packets before zero are priming even without skip-samples data
+        inpoint, outpoint = trim_points(info(start=-2 * FRAME))
+        self.assertIsNone(inpoint)
+        self.assertEqual(outpoint, round(98 * FRAME, 6))
+
+    def test_whole_packets(self):
+        inpoint, outpoint = trim_points(info(delay=2 * 1152 + 100, padding=1152 + 100))
+        self.assertAlmostEqual(inpoint / FRAME, 2, places=3)
+        self.assertAlmostEqual(outpoint / FRAME, 99, places=3)
+
+    def test_unusable(self):
+        self.assertEqual(trim_points(info(packets=0)), (None, None))
+        self.assertEqual(trim_points(dict(info(), frame=0)), (None, None))
+
+
+class ParsePacketsTest(unittest.TestCase):
+
+    def test_parse(self):
+        packets = [{"pts_time": f"{i * FRAME:.6f}", "duration_time": f"{FRAME:.6f}"} for i in range(10)]
+        packets[0]["side_data_list"] = [{"side_data_type": "Skip Samples", "skip_samples": 1105}]
+        packets[-1]["side_data_list"] = [{"side_data_type": "Skip Samples", "discard_padding": 700}]
+        packets.append({"pts_time": "N/A", "duration_time": "N/A"})
+        parsed = _parse_packets({"streams": [{"sample_rate": str(RATE)}], "packets": packets})
+        self.assertEqual(parsed["delay"], 1105)
+        self.assertEqual(parsed["padding"], 700)
+        self.assertEqual(parsed["sample_rate"], RATE)
+        self.assertAlmostEqual(parsed["end"], 10 * FRAME, places=5)
+
+    def test_unusable(self):
+        self.assertIsNone(_parse_packets(None))
+        self.assertIsNone(_parse_packets({"streams": [{}], "packets": []}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from batch import CANCELLED, DONE, FAILED, PENDING, RUNNING
+from jobs import JobManifest, JobRunner
+from planner import MixPlan, PlanEntry
+
+
+class RecordingEngine:
+    """Stands in for MixerEngine: plans one clip and 'renders' by writing the output path."""
+
+    def __init__(self, clip, fail_on=()):
+        self.clip = clip
+        self.fail_on = set(fail_on)
+        self.planned = []
+        self.rendered = []
+
+    def plan_mix(self, video_folder, target_duration, music_files=None, smart_audio=False,
+                 callback=None, seed=None, cancel_token=None):
+        self.planned.append(seed)
+        return MixPlan(None, [], target_duration, [PlanEntry(self.clip, target_duration)], seed=seed)
+
+    def render_plan(self, plan, output_path, output_format="mp4", callback=None, temp_dir=None,
+                    cancel_token=None, on_progress=None, extra_outputs=None):
+        self.rendered.append((plan.seed, output_path))
+        if output_path in self.fail_on:
+            raise RuntimeError("ffmpeg failed")
+        return output_path
+
+
+class JobManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "jobs.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def settings(self, name):
+        return {"video_folder": self.tmp, "duration": 60.0, "output_path": os.path.join(self.tmp, name)}
+
+    def test_survives_reload(self):
+        manifest = JobManifest(self.path)
+        job = manifest.add(self.settings("a.mp4"), seed=7)
+        manifest.update(job["id"], status=RUNNING)
+        reloaded = JobManifest(self.path)
+        self.assertEqual(len(reloaded.jobs), 1)
+        self.assertEqual(reloaded.jobs[0]["seed"], 7)
+        self.assertEqual(reloaded.jobs[0]["status"], PENDING)  # interrupted jobs run again
+
+    def test_numbers_never_repeat(self):
+        manifest = JobManifest(self.path)
+        first = manifest.add(self.settings("a.mp4"))
+        second = manifest.add(self.settings("b.mp4"))
+        manifest.update(first["id"], status=DONE)
+        manifest.clear(finished_only=True)
+        third = manifest.add(self.settings("c.mp4"))
+        self.assertEqual([first["number"], second["number"], third["number"]], [1, 2, 3])
+        manifest.clear()
+        self.assertEqual(JobManifest(self.path).next_number, 4)
+
+    def test_unfinished(self):
+        manifest = JobManifest(self.path)
+        jobs = [manifest.add(self.settings(f"{i}.mp4")) for i in range(4)]
+        for job, status in zip(jobs, (DONE, FAILED, CANCELLED, PENDING)):
+            manifest.update(job["id"], status=status)
+        self.assertEqual([job["id"] for job in manifest.unfinished()], [job["id"] for job in jobs[1:]])
+
+    def test_malformed_jobs_are_skipped(self):
+        good = {"id": "abc", "settings": self.settings("a.mp4"), "seed": 1, "status": PENDING}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"jobs": [good, {"id": "no-status", "settings": self.settings("b.mp4"), "seed": 2},
+                                {"status": PENDING}, "junk", None]}, f)
+        manifest = JobManifest(self.path)
+        self.assertEqual([job["id"] for job in manifest.jobs], ["abc"])
+
+    def test_unreadable_manifest(self):
+        for content in ("not json", "[]", '{"jobs": 5}'):
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            self.assertEqual(JobManifest(self.path).jobs, [])
+
+
+class JobRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.clip = os.path.join(self.tmp, "clip.mp4")
+        open(self.clip, 'wb').close()
+        self.manifest = JobManifest(os.path.join(self.tmp, "jobs.json"))
+        for name in ("a.mp4", "b.mp4", "c.mp4"):
+            self.manifest.add({"video_folder": self.tmp, "duration": 30.0,
+                               "output_path": os.path.join(self.tmp, name)})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_runs_and_records_state(self):
+        failing = os.path.join(self.tmp, "b.mp4")
+        engine = RecordingEngine(self.clip, fail_on=[failing])
+        JobRunner(self.manifest, engine, workers=2).run()
+        statuses = {os.path.basename(job["settings"]["output_path"]): job["status"] for job in self.manifest.jobs}
+        self.assertEqual(statuses, {"a.mp4": DONE, "b.mp4": FAILED, "c.mp4": DONE})
+        self.assertEqual(sorted(engine.planned), sorted(job["seed"] for job in self.manifest.jobs))
+        failed = [job for job in self.manifest.jobs if job["status"] == FAILED][0]
+        self.assertEqual(failed["error"], "ffmpeg failed")
+        self.assertIsNotNone(failed["plan"])
+
+        # A re-run only retries the failed job, with its stored plan
+        engine = RecordingEngine(self.clip)
+        JobRunner(JobManifest(self.manifest.path), engine).run()
+        self.assertEqual(engine.planned, [])
+        self.assertEqual(engine.rendered, [(failed["seed"], failing)])
+
+    def test_replans_when_sources_are_gone(self):
+        job = self.manifest.jobs[0]
+        stale = MixPlan(None, [], 30.0, [PlanEntry(os.path.join(self.tmp, "evicted.mp4"), 30.0)], seed=job["seed"])
+        self.manifest.update(job["id"], plan=stale.to_dict())
+        engine = RecordingEngine(self.clip)
+        JobRunner(self.manifest, engine, workers=1).run()
+        self.assertEqual(len(engine.planned), 3)
+        plan = MixPlan.from_dict(self.manifest.get(job["id"])["plan"])
+        self.assertEqual(plan.missing(), [])
+
+    def test_cancelled_jobs(self):
+        engine = RecordingEngine(self.clip)
+        runner = JobRunner(self.manifest, engine, workers=1)
+        runner.cancel()
+        runner.run()
+        self.assertEqual(engine.rendered, [])
+        self.assertEqual(len(self.manifest.unfinished()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
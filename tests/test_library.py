@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from library import LibraryIndex
+from probe_cache import ProbeCache
+
+
+class LibraryIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "videos")
+        os.makedirs(os.path.join(self.folder, "sub"))
+        self.write("a.mp4", b"aaaa")
+        self.write("b.mov", b"bb")
+        self.write("notes.txt", b"not media")
+        self.write(os.path.join("sub", "c.mkv"), b"c")
+        self.settled = int(time.time()) - 60
+        self.settle()
+        self.index = LibraryIndex(os.path.join(self.tmp, "library.sqlite3"))
+
+    def tearDown(self):
+        self.index._conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, name, data, age=60):
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def settle(self, offset=0):
+        """Backdate the folder mtimes so the index trusts its listing."""
+        stamp = self.settled + offset
+        for folder in (self.folder, os.path.join(self.folder, "sub")):
+            os.utime(folder, (stamp, stamp))
+
+    def test_lists_media_only(self):
+        names = [os.path.basename(path) for path in self.index.files(self.folder)]
+        self.assertEqual(names, ["a.mp4", "b.mov"])
+        names = [os.path.basename(path) for path in self.index.files(self.folder, recursive=True)]
+        self.assertEqual(names, ["a.mp4", "b.mov", "c.mkv"])
+
+    def test_unchanged_folder_is_reused(self):
+        first = self.index.entries(self.folder)
+        self.assertEqual(self.index.stats(), {"dirs_listed": 1, "dirs_reused": 0})
+        self.assertEqual(self.index.entries(self.folder), first)
+        self.assertEqual(self.index.stats(), {"dirs_listed": 1, "dirs_reused": 1})
+
+    def test_in_place_edit(self):
+        # Overwriting a file leaves its folder mtime alone: the index answers
+        # without a stat per file and the probe cache catches the edit
+        cache = ProbeCache(os.path.join(self.tmp, "probe_cache.sqlite3"))
+        path = os.path.join(self.folder, "a.mp4")
+        before = self.index.entries(self.folder)
+        cache.put(path, "media", {"duration": 1.0})
+        self.write("a.mp4", b"edited in place", age=30)
+        self.settle()
+        self.assertEqual(self.index.entries(self.folder), before)
+        self.assertEqual(self.index.stats(), {"dirs_listed": 1, "dirs_reused": 1})
+        self.assertIsNone(cache.get(path, "media"))
+        cache._conn.close()
+
+    def test_added_file(self):
+        before = self.index.snapshot(self.folder)
+        self.write("d.avi", b"dd")
+        self.settle(offset=30)
+        names = [os.path.basename(path) for path in self.index.files(self.folder)]
+        self.assertEqual(names, ["a.mp4", "b.mov", "d.avi"])
+        self.assertEqual(self.index.stats()["dirs_listed"], 2)
+        self.assertNotEqual(self.index.snapshot(self.folder), before)
+
+    def test_removed_file(self):
+        self.index.files(self.folder)
+        os.remove(os.path.join(self.folder, "b.mov"))
+        self.settle(offset=30)
+        names = [os.path.basename(path) for path in self.index.files(self.folder)]
+        self.assertEqual(names, ["a.mp4"])
+
+    def test_snapshot_is_stable(self):
+        self.assertEqual(self.index.snapshot(self.folder), self.index.snapshot(self.folder))
+
+    def test_recently_changed_folder_is_listed_again(self):
+        os.utime(self.folder, None)
+        self.index.files(self.folder)
+        self.index.files(self.folder)
+        self.assertEqual(self.index.stats(), {"dirs_listed": 2, "dirs_reused": 0})
+
+    def test_missing_folder(self):
+        self.assertEqual(self.index.files(os.path.join(self.tmp, "gone")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import probe_cache
+from loudness import _parse_loudnorm, loudness_many, measure_loudness, track_gain
+from probe_cache import ProbeCache
+
+SUMMARY = """[Parsed_loudnorm_0 @ 0x55d0c0] 
+{
+	"input_i" : "%s",
+	"input_tp" : "%s",
+	"input_lra" : "6.40",
+	"input_thresh" : "-31.09",
+	"output_i" : "-24.18",
+	"output_tp" : "-2.00",
+	"output_lra" : "5.30",
+	"output_thresh" : "-34.19",
+	"normalization_type" : "dynamic",
+	"target_offset" : "0.18"
+}
+"""
+
+
+class TrackGainTest(unittest.TestCase):
+
+    def test_to_target(self):
+        self.assertEqual(track_gain({"integrated": -20.0, "true_peak": -9.0}), 6.0)
+        self.assertEqual(track_gain({"integrated": -8.0, "true_peak": 0.5}), -6.0)
+
+    def test_true_peak_ceiling(self):
+        self.assertEqual(track_gain({"integrated": -20.0, "true_peak": -5.0}), 4.0)
+
+    def test_inaudible_change(self):
+        self.assertEqual(track_gain({"integrated": -14.05, "true_peak": -3.0}), 0.0)
+
+    def test_unmeasured(self):
+        self.assertEqual(track_gain(None), 0.0)
+        self.assertEqual(track_gain({}), 0.0)
+
+    def test_silent(self):
+        self.assertEqual(track_gain({"integrated": float("-inf"), "true_peak": float("-inf")}), 0.0)
+        self.assertEqual(track_gain({"integrated": float("nan"), "true_peak": -3.0}), 0.0)
+
+
+class ParseLoudnormTest(unittest.TestCase):
+
+    def test_summary(self):
+        stderr = "Input #0, mp3, from 'a.mp3':\n  Duration: 00:03:00.00\n" + SUMMARY % ("-23.52", "-1.20")
+        self.assertEqual(_parse_loudnorm(stderr), {"integrated": -23.52, "true_peak": -1.2, "lra": 6.4})
+
+    def test_silent(self):
+        self.assertIsNone(_parse_loudnorm(SUMMARY % ("-inf", "-inf")))
+
+    def test_no_summary(self):
+        self.assertIsNone(_parse_loudnorm(""))
+        self.assertIsNone(_parse_loudnorm("Error opening input {broken"))
+        self.assertIsNone(_parse_loudnorm('{"input_i" : "-23.0"}'))
+
+
+class CachedLoudnessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.saved = probe_cache._default_cache
+        probe_cache._default_cache = self.cache = ProbeCache(os.path.join(self.tmp, "probe_cache.sqlite3"))
+        self.good, self.silent = (os.path.join(self.tmp, name) for name in ("good.mp3", "silent.mp3"))
+        for path in (self.good, self.silent):
+            open(path, 'wb').close()
+        self.measured = {"integrated": -20.0, "true_peak": -3.0, "lra": 5.0}
+        self.cache.put(self.good, "loudness", self.measured)
+        self.cache.put(self.silent, "loudness", {"error": "no measurement"})
+
+    def tearDown(self):
+        probe_cache._default_cache = self.saved
+        self.cache._conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_failures_are_answered_from_the_cache(self):
+        self.assertEqual(loudness_many([self.good, self.silent]), {self.good: self.measured, self.silent: None})
+        self.assertIsNone(measure_loudness(self.silent))
+        self.assertEqual(self.cache.stats()["misses"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
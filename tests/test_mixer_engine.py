@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mixer_engine import MixerEngine, _tee_target, output_file
+from planner import MixPlan, PlanEntry
+
+
+def option(cmd, name, start=0):
+    return cmd[cmd.index(name, start) + 1]
+
+
+class MultiOutputTest(unittest.TestCase):
+    """Command lines of render_plan() with extra outputs (ffmpeg itself is not run)."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.saved_env = os.environ.get('MIXIT_CACHE_DIR')
+        os.environ['MIXIT_CACHE_DIR'] = os.path.join(self.tmp, "cache")
+        for patcher in (mock.patch('mixer_engine.get_ffmpeg_path', return_value='ffmpeg'),
+                        mock.patch('mixer_engine.run_process', side_effect=self.run_process)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.commands = []
+
+        self.engine = MixerEngine()
+        self.engine.segmented_crossfade = False
+        self.clips = [self.touch(f"clip{i}.mp4") for i in range(3)]
+        self.songs = [self.touch(f"song{i}.mp3") for i in range(2)]
+        self.out = os.path.join(self.tmp, "mix.mp4")
+
+    def tearDown(self):
+        if self.saved_env is None:
+            os.environ.pop('MIXIT_CACHE_DIR', None)
+        else:
+            os.environ['MIXIT_CACHE_DIR'] = self.saved_env
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def touch(self, name):
+        path = os.path.join(self.tmp, name)
+        open(path, 'wb').close()
+        return path
+
+    def run_process(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        return mock.Mock(ok=True)
+
+    def plan(self, audio_mode="concat"):
+        music = self.songs if audio_mode else []
+        entries = [PlanEntry(clip, 40.0) for clip in self.clips]
+        return MixPlan(audio_mode, music, 120.0, entries)
+
+    def test_single_output(self):
+        written = self.engine.render_plan(self.plan(), self.out)
+        self.assertEqual(written, self.out)
+        cmd, = self.commands
+        self.assertEqual(cmd.count('-map'), 2)
+        self.assertIn('-shortest', cmd)
+        self.assertNotIn('-t', cmd)
+        self.assertNotIn('tee', cmd)
+        self.assertEqual(cmd[-1], self.out)
+
+    def test_same_length_outputs_share_a_tee(self):
+        mkv = os.path.join(self.tmp, "mix.mkv")
+        webm = os.path.join(self.tmp, "mix.webm")  # written as mix.mkv too
+        written = self.engine.render_outputs(self.plan(), [(self.out, "mp4", None), (mkv, "mkv", None),
+                                                           (webm, "webm", None)])
+        self.assertEqual(written, [self.out, mkv, mkv])
+        cmd, = self.commands
+        self.assertEqual(cmd.count('-map'), 2)
+        self.assertEqual(option(cmd, '-f', cmd.index('-shortest')), 'tee')
+        self.assertEqual(cmd[-1], f"[f=mp4]{_tee_target(self.out)}|[f=matroska]{_tee_target(mkv)}")
+
+    def test_cuts_get_their_own_output(self):
+        cut = os.path.join(self.tmp, "cut.mp4")
+        longer = os.path.join(self.tmp, "longer.mp4")
+        self.engine.render_outputs(self.plan(), [(self.out, "mp4", None), (cut, "mp4", 30.0),
+                                                 (longer, "mp4", 500.0)])
+        cmd, = self.commands
+        self.assertEqual(cmd.count('-map'), 4)  # video + audio per distinct length
+        # Longer than the mix: the same output as the full mix, through the tee
+        full = cmd.index(f"[f=mp4]{_tee_target(self.out)}|[f=mp4]{_tee_target(longer)}")
+        self.assertLess(full, cmd.index(cut))
+        self.assertNotIn('-t', cmd[:full])
+        self.assertEqual(option(cmd, '-t', full), '30.0')
+
+    def test_clip_audio_is_cut_with_t(self):
+        self.engine.render_outputs(self.plan(None), [(self.out, "mp4", None)])
+        cmd, = self.commands
+        self.assertEqual(option(cmd, '-t'), '120.0')
+        self.assertEqual(option(cmd, '-map', cmd.index('0:v')), '0:a?')
+        self.assertNotIn('-shortest', cmd)
+
+    def test_filter_graph_is_split_per_length(self):
+        cut = os.path.join(self.tmp, "cut.mkv")
+        self.engine.render_outputs(self.plan("crossfade"), [(self.out, "mp4", None), (cut, "mkv", 60.0)])
+        cmd, = self.commands
+        graph = option(cmd, '-filter_complex')
+        self.assertIn("acrossfade=d=3.0", graph)
+        self.assertTrue(graph.endswith("[a1]asplit=2[out0][out1]"))
+        maps = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-map']
+        self.assertEqual(maps, ['0:v', '[out0]', '0:v', '[out1]'])
+
+    def test_tee_shares_encoded_audio(self):
+        mkv = os.path.join(self.tmp, "mix.mkv")
+        self.engine.render_outputs(self.plan("crossfade"), [(self.out, "mp4", None), (mkv, "mkv", None)])
+        cmd, = self.commands
+        self.assertEqual(option(cmd, '-flags:a'), '+global_header')
+        self.assertNotIn('asplit', option(cmd, '-filter_complex'))
+
+    def test_missing_source(self):
+        os.remove(self.clips[1])
+        with self.assertRaises(ValueError):
+            self.engine.render_plan(self.plan(), self.out)
+        self.assertEqual(self.commands, [])
+
+
+class OutputNamesTest(unittest.TestCase):
+
+    def test_output_file(self):
+        self.assertEqual(output_file("a/mix.webm", "webm"), "a/mix.mkv")
+        self.assertEqual(output_file("a/mix.mp4", "mp4"), "a/mix.mp4")
+
+    def test_tee_target(self):
+        if os.sep == '\\':
+            self.assertEqual(_tee_target(r"C:\mix [1].mp4"), r"C:/mix \[1\].mp4")
+        else:
+            self.assertEqual(_tee_target("/tmp/a|b[1].mp4"), r"/tmp/a\|b\[1\].mp4")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from media_info import MediaInfo, StreamInfo
+from normalizer import DEFAULT_AUDIO_BITRATE, AudioNormalizer, ClipNormalizer
+from preflight import stream_signature
+
+
+def clip_signature(codec='h264', profile='High', audio='aac', time_base='1/15360'):
+    streams = [StreamInfo(0, 'video', codec, profile, 1920, 1080, '30000/1001', 'yuv420p', time_base)]
+    if audio:
+        streams.append(StreamInfo(1, 'audio', audio, 'LC', sample_rate=48000, channels=2))
+    return stream_signature(MediaInfo("clip.mp4", 10.0, streams=streams))
+
+
+def option(cmd, name):
+    return cmd[cmd.index(name) + 1]
+
+
+class NormalizerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.saved_env = os.environ.get('MIXIT_CACHE_DIR')
+        os.environ['MIXIT_CACHE_DIR'] = self.tmp
+        patcher = mock.patch('normalizer.get_ffmpeg_path', return_value='ffmpeg')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if self.saved_env is None:
+            os.environ.pop('MIXIT_CACHE_DIR', None)
+        else:
+            os.environ['MIXIT_CACHE_DIR'] = self.saved_env
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class FailingNormalizer(ClipNormalizer):
+    """Sources named 'gone*' vanish before they are transcoded."""
+
+    def normalize_one(self, source, signature, ext, cancel_token=None):
+        if os.path.basename(source).startswith('gone'):
+            raise FileNotFoundError(source)
+        return source + ".normalized" + ext
+
+
+class ClipNormalizerTest(NormalizerTestCase):
+
+    def test_build_command(self):
+        cmd = ClipNormalizer().build_command("in.mov", "out.mp4", clip_signature())
+        self.assertEqual(cmd[:6], ['ffmpeg', '-y', '-v', 'error', '-i', 'in.mov'])
+        self.assertEqual(option(cmd, '-vf'),
+                         "scale=1920:1080:force_original_aspect_ratio=decrease,"
+                         "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30000/1001")
+        self.assertEqual(option(cmd, '-c:v'), 'libx264')
+        self.assertEqual(option(cmd, '-profile:v'), 'high')
+        self.assertEqual(option(cmd, '-pix_fmt'), 'yuv420p')
+        self.assertEqual(option(cmd, '-c:a'), 'aac')
+        self.assertEqual(option(cmd, '-ar'), '48000')
+        self.assertEqual(option(cmd, '-video_track_timescale'), '15360')
+        self.assertEqual(cmd[-1], "out.mp4")
+
+    def test_without_audio(self):
+        cmd = ClipNormalizer().build_command("in.mov", "out.mkv", clip_signature(codec='hevc', profile='Main 10', audio=None))
+        self.assertEqual(option(cmd, '-c:v'), 'libx265')
+        self.assertEqual(option(cmd, '-profile:v'), 'main10')
+        self.assertIn('-an', cmd)
+        self.assertNotIn('-c:a', cmd)
+        self.assertNotIn('-video_track_timescale', cmd)  # mp4/mov only
+
+    def test_can_normalize(self):
+        normalizer = ClipNormalizer()
+        self.assertTrue(normalizer.can_normalize(clip_signature()))
+        self.assertTrue(normalizer.can_normalize(clip_signature(audio=None)))
+        self.assertFalse(normalizer.can_normalize(clip_signature(codec='prores')))
+        self.assertFalse(normalizer.can_normalize(clip_signature(audio='dts')))
+        self.assertFalse(normalizer.can_normalize((None, None)))
+
+    def test_normalize_many(self):
+        normalizer = FailingNormalizer(workers=2)
+        results = normalizer.normalize_many(["a.mov", "gone.mov"], clip_signature(), ".mp4")
+        self.assertEqual(results, {"a.mov": "a.mov.normalized.mp4", "gone.mov": None})
+        results = normalizer.normalize_many(["a.mov"], clip_signature(codec='prores'), ".mp4")
+        self.assertEqual(results, {"a.mov": None})
+
+
+class AudioNormalizerTest(NormalizerTestCase):
+
+    def audio_signature(self, codec='mp3', sample_rate=44100):
+        info = MediaInfo("song", 100.0, streams=[StreamInfo(0, 'audio', codec, sample_rate=sample_rate, channels=2)])
+        return stream_signature(info, include_video=False)[1]
+
+    def test_build_command(self):
+        cmd = AudioNormalizer().build_command("in.m4a", "out.mp3", (self.audio_signature(), 256000))
+        self.assertEqual(cmd[:6], ['ffmpeg', '-y', '-v', 'error', '-i', 'in.m4a'])
+        self.assertEqual(option(cmd, '-map'), '0:a:0')
+        self.assertIn('-vn', cmd)  # no cover art
+        self.assertEqual(option(cmd, '-map_metadata'), '-1')
+        self.assertEqual(option(cmd, '-c:a'), 'libmp3lame')
+        self.assertEqual(option(cmd, '-b:a'), '256000')
+        self.assertEqual(option(cmd, '-ar'), '44100')
+        self.assertEqual(option(cmd, '-ac'), '2')
+        self.assertEqual(cmd[-1], "out.mp3")
+
+    def test_bitrate(self):
+        cmd = AudioNormalizer().build_command("in.mp3", "out.m4a", (self.audio_signature('aac', 48000), None))
+        self.assertEqual(option(cmd, '-b:a'), str(DEFAULT_AUDIO_BITRATE))
+        cmd = AudioNormalizer().build_command("in.mp3", "out.flac", (self.audio_signature('flac'), 256000))
+        self.assertNotIn('-b:a', cmd)
+
+    def test_can_normalize(self):
+        normalizer = AudioNormalizer()
+        self.assertTrue(normalizer.can_normalize((self.audio_signature(), None)))
+        self.assertFalse(normalizer.can_normalize((self.audio_signature('dts'), None)))
+        self.assertFalse(normalizer.can_normalize((None, None)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from plan_cache import PlanCache, load_plan, save_plan
+from planner import MixPlan, PlanEntry
+
+
+class PlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.clips = [self.touch(f"clip{i}.mp4", b"x" * (i + 1)) for i in range(3)]
+        self.song = self.touch("song.mp3", b"song")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def touch(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, (1000000000, 1000000000))
+        return path
+
+    def plan(self, seed=1, outpoint=4.5):
+        entries = [PlanEntry(self.clips[0], 10.0), PlanEntry(self.clips[1], 8.0),
+                   PlanEntry(self.clips[2], 6.0, outpoint=outpoint)]
+        music = [PlanEntry(self.song, 30.0, 0.026122, 22.5)]
+        return MixPlan("concat", music, 22.5, entries, {"target_duration": 22.5}, seed, "abc")
+
+
+class MixPlanTest(PlanTestCase):
+
+    def test_round_trip(self):
+        plan = self.plan()
+        copy = MixPlan.from_dict(plan.to_dict())
+        self.assertEqual(copy.to_dict(), plan.to_dict())
+        self.assertEqual(plan.diff(copy), [])
+        path = os.path.join(self.tmp, "plan.json")
+        save_plan(plan, path)
+        self.assertEqual(load_plan(path).to_dict(), plan.to_dict())
+
+    def test_plain_song_paths(self):
+        plan = MixPlan("crossfade", [self.song], 30.0, [PlanEntry(self.clips[0], 30.0)])
+        copy = MixPlan.from_dict(plan.to_dict())
+        self.assertEqual(copy.music, [self.song])
+        self.assertFalse(copy.keep_clip_audio)
+        self.assertEqual(copy.sources(), [self.song, self.clips[0]])
+
+    def test_diff(self):
+        lines = self.plan().diff(self.plan(seed=2, outpoint=5.0))
+        self.assertEqual(lines, ["seed: 1 -> 2", "clips: 3 -> 3 entries, 1 position(s) differ"])
+        other = self.plan()
+        other.music = [self.song]
+        other.settings = {"target_duration": 30.0}
+        lines = self.plan().diff(other)
+        self.assertIn("settings.target_duration: 22.5 -> 30.0", lines)
+        self.assertIn("music: 1 -> 1 song(s)", lines)
+        self.assertIn(f"  + {self.song}", lines)
+
+    def test_missing(self):
+        plan = self.plan()
+        self.assertEqual(plan.missing(), [])
+        os.remove(self.clips[1])
+        self.assertEqual(plan.missing(), [self.clips[1]])
+
+
+class PlanCacheTest(PlanTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = PlanCache(root=os.path.join(self.tmp, "cache"))
+        self.key = PlanCache.make_key({"target_duration": 22.5}, 1, "abc")
+
+    def test_hit(self):
+        self.assertIsNone(self.cache.get(self.key))
+        self.cache.put(self.key, self.plan())
+        self.assertEqual(self.cache.get(self.key).to_dict(), self.plan().to_dict())
+        self.assertIsNone(self.cache.get(PlanCache.make_key({"target_duration": 22.5}, 2, "abc")))
+
+    def test_edited_source_is_a_miss(self):
+        self.cache.put(self.key, self.plan())
+        self.touch("clip1.mp4", b"edited in place")
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_removed_source_is_a_miss(self):
+        self.cache.put(self.key, self.plan())
+        os.remove(self.song)
+        self.assertIsNone(self.cache.get(self.key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import random
+import unittest
+
+from planner import TAIL_STEP, PlanEntry, _fill_tail, plan_video, total_length
+
+
+class FillTailTest(unittest.TestCase):
+
+    def test_subset_lands_inside_tolerance(self):
+        durations = {"a": 7.0, "b": 3.0, "c": 4.5, "d": 2.0}
+        subset = _fill_tail(list(durations), durations, 6.4, 0.5)
+        self.assertIsNotNone(subset)
+        total = sum(durations[clip] for clip in subset)
+        self.assertGreaterEqual(total, 6.4)
+        self.assertLessEqual(total, 6.9)
+
+    def test_each_clip_used_once(self):
+        durations = {"a": 2.0, "b": 5.0}
+        self.assertIsNone(_fill_tail(list(durations), durations, 4.0, 0.5))
+
+    def test_no_subset(self):
+        durations = {"a": 10.0, "b": 20.0}
+        self.assertIsNone(_fill_tail(list(durations), durations, 4.0, 0.5))
+
+    def test_rounding_never_undershoots(self):
+        # 2.09 rounds down to 2.0 in steps, so two clips must not count as 4.15
+        durations = {"a": 2.09, "b": 2.09, "c": 0.3}
+        subset = _fill_tail(list(durations), durations, 4.15, 0.5)
+        self.assertIsNotNone(subset)
+        self.assertGreaterEqual(sum(durations[clip] for clip in subset), 4.15 - TAIL_STEP / 10)
+
+    def test_short_clips_do_not_drift(self):
+        # 60 clips of 1.99 s floor to 1.9 s each; the real sum must decide
+        durations = {f"s{i}": 1.99 for i in range(60)}
+        subset = _fill_tail(list(durations), durations, 109.3, 0.5)
+        self.assertEqual(len(subset), 55)  # 109.45 s
+        self.assertIsNone(_fill_tail(list(durations), durations, 110.0, 0.5))
+
+    def test_skips_clips_shorter_than_a_step(self):
+        durations = {"a": 0.05, "b": 1.0}
+        self.assertEqual(_fill_tail(list(durations), durations, 1.0, 0.2), ["b"])
+
+
+class PlanVideoTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.clips = [f"clip{i:02d}.mp4" for i in range(12)]
+        self.durations = {clip: round(rng.uniform(8, 30), 2) for clip in self.clips}
+
+    def test_covers_target_exactly(self):
+        for target in (5.0, 29.9, 60.0, 333.3, 3600.0):
+            entries = plan_video(self.clips, self.durations, target, rng=random.Random(1))
+            self.assertAlmostEqual(total_length(entries), target, places=2)
+
+    def test_only_last_entry_is_trimmed(self):
+        entries = plan_video(self.clips, self.durations, 1000.0, rng=random.Random(2))
+        for entry in entries[:-1]:
+            self.assertIsNone(entry.inpoint)
+            self.assertIsNone(entry.outpoint)
+        last = entries[-1]
+        if last.outpoint is not None:
+            self.assertLess(last.outpoint, last.duration)
+            self.assertGreater(last.outpoint, 0)
+
+    def assertTrimmed(self, entries, target):
+        self.assertAlmostEqual(total_length(entries), target, places=2)
+        for entry in entries[:-1]:
+            self.assertIsNone(entry.outpoint)
+        last = entries[-1]
+        if last.outpoint is not None:
+            self.assertGreater(last.outpoint, 0)
+            self.assertLess(last.outpoint, last.duration)
+
+    def test_many_short_clips(self):
+        durations = {"long": 120.0}
+        durations.update((f"s{i}", 1.99) for i in range(60))
+        for seed in range(50):
+            target = 100.0 + seed
+            entries = plan_video(list(durations), durations, target, rng=random.Random(seed))
+            self.assertTrimmed(entries, target)
+
+    def test_tiny_clips(self):
+        durations = {f"t{i}": 0.19 for i in range(20)}
+        for seed in range(20):
+            entries = plan_video(list(durations), durations, 1.0, rng=random.Random(seed))
+            self.assertTrimmed(entries, 1.0)
+
+    def test_short_target_trims_one_clip(self):
+        entries = plan_video(self.clips, self.durations, 3.0, rng=random.Random(3))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].outpoint, 3.0)
+
+    def test_seed_is_reproducible(self):
+        first = plan_video(self.clips, self.durations, 500.0, rng=random.Random(42))
+        second = plan_video(self.clips, self.durations, 500.0, rng=random.Random(42))
+        self.assertEqual([e.to_dict() for e in first], [e.to_dict() for e in second])
+
+    def test_ignores_clips_without_duration(self):
+        durations = {"a": 0.0, "b": 10.0}
+        entries = plan_video(["a", "b", "c"], durations, 25.0, rng=random.Random(4))
+        self.assertEqual({entry.path for entry in entries}, {"b"})
+        self.assertAlmostEqual(total_length(entries), 25.0, places=2)
+
+    def test_no_usable_clips(self):
+        self.assertEqual(plan_video(["a"], {"a": 0.0}, 60.0), [])
+        self.assertEqual(plan_video([], {}, 60.0), [])
+
+    def test_entry_length(self):
+        self.assertEqual(PlanEntry("a", 10.0).length, 10.0)
+        self.assertEqual(PlanEntry("a", 10.0, 1.5, 4.0).length, 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from media_info import MediaInfo, StreamInfo
+from preflight import preflight, stream_signature
+
+
+def clip(path, width=1920, height=1080, audio="aac", duration=10.0):
+    streams = [StreamInfo(0, 'video', 'h264', 'High', width, height, '30/1', 'yuv420p', '1/15360')]
+    if audio:
+        streams.append(StreamInfo(1, 'audio', audio, 'LC', sample_rate=48000, channels=2,
+                                  channel_layout='stereo'))
+    return MediaInfo(path, duration, 'mov,mp4', streams=streams)
+
+
+def library(*clips):
+    return {info.path: info for info in clips}
+
+
+class PreflightTest(unittest.TestCase):
+
+    def test_uniform(self):
+        report = preflight(library(clip("a"), clip("b"), clip("c")))
+        self.assertTrue(report.is_uniform)
+        self.assertEqual(sorted(report.compatible), ["a", "b", "c"])
+        self.assertEqual(report.outliers, [])
+
+    def test_outliers(self):
+        report = preflight(library(clip("a"), clip("b"), clip("c", 1280, 720)))
+        self.assertFalse(report.is_uniform)
+        self.assertEqual(sorted(report.compatible), ["a", "b"])
+        self.assertEqual(report.outliers, ["c"])
+        self.assertEqual(report.dominant_signature, stream_signature(clip("a")))
+
+    def test_audio_only_matters_when_kept(self):
+        media = library(clip("a"), clip("b"), clip("c", audio="mp3"), clip("d", audio=None))
+        self.assertEqual(len(preflight(media).buckets), 3)
+        self.assertTrue(preflight(media, include_audio=False).is_uniform)
+
+    def test_music_ignores_video(self):
+        song = MediaInfo("s", 100.0, 'mp3', streams=[StreamInfo(0, 'audio', 'mp3', sample_rate=44100, channels=2)])
+        cover = MediaInfo("t", 100.0, 'mp3', streams=[
+            StreamInfo(0, 'video', 'mjpeg', width=500, height=500),
+            StreamInfo(1, 'audio', 'mp3', sample_rate=44100, channels=2),
+        ])
+        self.assertTrue(preflight(library(song, cover), include_video=False).is_uniform)
+
+    def test_ties_go_to_longer_clips(self):
+        report = preflight(library(clip("a", duration=5.0), clip("b", 1280, 720, duration=50.0)))
+        self.assertEqual(report.compatible, ["b"])
+
+    def test_summary_lines(self):
+        report = preflight(library(clip("a"), clip("b"), clip("c", 1280, 720)))
+        lines = report.summary_lines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("[dominant] 2 clip(s): h264 High 1920x1080 @30/1"))
+        self.assertTrue(lines[1].startswith("[outlier] 1 clip(s): h264 High 1280x720"))
+        self.assertIn("aac 48000Hz stereo", lines[0])
+
+    def test_empty(self):
+        report = preflight({})
+        self.assertIsNone(report.dominant_signature)
+        self.assertEqual(report.compatible, [])
+        self.assertEqual(report.summary_lines(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
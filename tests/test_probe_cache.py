@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from media_info import MediaInfo
+from probe_cache import TOUCH_BATCH, ProbeCache
+
+
+class ProbeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "a.mp4")
+        self.write(b"aaaa")
+        self.cache = ProbeCache(os.path.join(self.tmp, "probe_cache.sqlite3"))
+
+    def tearDown(self):
+        self.cache._conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, data, stamp=1000000000):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        os.utime(self.path, (stamp, stamp))
+
+    def last_used(self, kind="media"):
+        row = self.cache._conn.execute(
+            "SELECT last_used FROM probes WHERE path = ? AND kind = ?", (self.path, kind)
+        ).fetchone()
+        return row[0]
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get(self.path, "media"))
+        self.cache.put(self.path, "media", {"duration": 12.5})
+        self.assertEqual(self.cache.get(self.path, "media"), {"duration": 12.5})
+        self.assertIsNone(self.cache.get(self.path, "gapless"))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 2, 1))
+
+    def test_changed_file_is_a_miss(self):
+        self.cache.put(self.path, "media", {"duration": 12.5})
+        self.write(b"aaaa", stamp=1000000001)
+        self.assertIsNone(self.cache.get(self.path, "media"))
+        self.write(b"bbbbbb")
+        self.assertIsNone(self.cache.get(self.path, "media"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_missing_file(self):
+        self.cache.put(os.path.join(self.tmp, "gone.mp4"), "media", {"duration": 1.0})
+        self.assertIsNone(self.cache.get(os.path.join(self.tmp, "gone.mp4"), "media"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_hits_are_written_in_batches(self):
+        self.cache.put(self.path, "media", {"duration": 12.5})
+        stored = self.last_used()
+        self.cache.get(self.path, "media")
+        self.assertEqual(self.last_used(), stored)
+        self.cache.flush()
+        self.assertGreaterEqual(self.last_used(), stored)
+        self.assertEqual(self.cache._touched, {})
+
+        for _ in range(TOUCH_BATCH - 1):
+            self.cache.get(self.path, "media")
+        self.assertEqual(len(self.cache._touched), 1)
+        self.cache.stats()
+        self.assertEqual(self.cache._touched, {})
+
+    def test_eviction_sees_pending_hits(self):
+        cache = ProbeCache(os.path.join(self.tmp, "small.sqlite3"), max_entries=2)
+        other = os.path.join(self.tmp, "b.mp4")
+        shutil.copy(self.path, other)
+        cache.put(self.path, "media", {"duration": 1.0})
+        cache.put(other, "media", {"duration": 2.0})
+        cache._conn.execute("UPDATE probes SET last_used = 1")
+        cache.get(self.path, "media")  # most recently used, only noted in memory
+        cache.put(other, "gapless", {"frame": 0.026})
+        self.assertIsNotNone(cache.get(self.path, "media"))
+        self.assertIsNone(cache.get(other, "media"))
+        cache._conn.close()
+
+    def test_failed_probe_decodes_empty(self):
+        self.cache.put(self.path, "media", {"error": "Invalid data found when processing input"})
+        info = MediaInfo.from_dict(self.path, self.cache.get(self.path, "media"))
+        self.assertFalse(info.ok)
+        self.assertEqual(info.streams, ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from progress import ProgressEvent, ProgressParser
+
+
+def feed_block(parser, lines):
+    events = [parser.feed(line) for line in lines]
+    for event in events[:-1]:
+        assert event is None
+    return events[-1]
+
+
+class ProgressParserTest(unittest.TestCase):
+
+    def test_block(self):
+        event = feed_block(ProgressParser(), [
+            "frame=250\n", "fps=50.00\n", "bitrate=1234.5kbits/s\n", "total_size=1048576\n",
+            "out_time_us=10000000\n", "out_time=00:00:10.000000\n", "speed=2.5x\n", "progress=continue\n",
+        ])
+        self.assertEqual(event.frame, 250)
+        self.assertEqual(event.fps, 50.0)
+        self.assertEqual(event.bitrate, 1234.5)
+        self.assertEqual(event.total_size, 1048576)
+        self.assertEqual(event.seconds, 10.0)
+        self.assertEqual(event.speed, 2.5)
+        self.assertFalse(event.is_end)
+
+    def test_na_values(self):
+        event = feed_block(ProgressParser(), [
+            "bitrate=N/A", "speed=N/A", "out_time_us=N/A", "out_time=N/A", "progress=continue",
+        ])
+        self.assertIsNone(event.bitrate)
+        self.assertIsNone(event.speed)
+        self.assertIsNone(event.out_time_us)
+        self.assertEqual(event.seconds, 0.0)
+        self.assertIsNone(event.eta(60.0))
+
+    def test_out_time_fallbacks(self):
+        parser = ProgressParser()
+        event = feed_block(parser, ["out_time_ms=2500000", "progress=continue"])
+        self.assertEqual(event.seconds, 2.5)
+        event = feed_block(parser, ["out_time=01:02:03.500000", "progress=end"])
+        self.assertEqual(event.seconds, 3723.5)
+        self.assertTrue(event.is_end)
+
+    def test_blocks_do_not_leak(self):
+        parser = ProgressParser()
+        feed_block(parser, ["frame=10", "speed=1x", "progress=continue"])
+        event = feed_block(parser, ["out_time_us=1000000", "progress=continue"])
+        self.assertIsNone(event.frame)
+        self.assertIsNone(event.speed)
+
+    def test_ignores_noise(self):
+        parser = ProgressParser()
+        self.assertIsNone(parser.feed(""))
+        self.assertIsNone(parser.feed("not a key value line"))
+
+
+class ProgressEventTest(unittest.TestCase):
+
+    def test_fraction_and_eta(self):
+        event = ProgressEvent(out_time_us=30000000, speed=2.0)
+        self.assertEqual(event.fraction(120.0), 0.25)
+        self.assertEqual(event.eta(120.0), 45.0)
+        self.assertEqual(event.fraction(20.0), 1.0)
+        self.assertEqual(event.fraction(0), 0.0)
+
+    def test_overall_wins(self):
+        event = ProgressEvent(out_time_us=30000000, speed=2.0, overall=0.6, remaining=12.0)
+        self.assertEqual(event.fraction(120.0), 0.6)
+        self.assertEqual(event.eta(120.0), 12.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from planner import PlanEntry
+from segments import split_plan
+
+
+def entries(*lengths):
+    return [PlanEntry(f"clip{i}", length) for i, length in enumerate(lengths)]
+
+
+class SplitPlanTest(unittest.TestCase):
+
+    def test_keeps_order(self):
+        plan = entries(*([10.0] * 12))
+        chunks = split_plan(plan, 4)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual([entry for chunk in chunks for entry in chunk], plan)
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 3, 3])
+
+    def test_similar_length(self):
+        plan = entries(5.0, 25.0, 10.0, 10.0, 30.0, 5.0, 15.0)
+        chunks = split_plan(plan, 2)
+        self.assertEqual(len(chunks), 2)
+        lengths = [sum(entry.length for entry in chunk) for chunk in chunks]
+        self.assertEqual(lengths, [50.0, 50.0])
+
+    def test_at_most_count(self):
+        self.assertEqual(len(split_plan(entries(10.0, 10.0), 5)), 2)
+        self.assertEqual(len(split_plan(entries(10.0, 10.0, 10.0, 10.0), 3)), 3)
+
+    def test_single_chunk(self):
+        plan = entries(1.0, 2.0, 3.0)
+        self.assertEqual(split_plan(plan, 1), [plan])
+
+    def test_empty(self):
+        self.assertEqual(split_plan([], 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,43 +1,197 @@
 import os
-import subprocess
+import json
+import random
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from ffmpeg_helper import get_ffprobe_path
+from process_runner import run_process, ProcessError, MixCancelled
+from probe_cache import get_probe_cache
+from media_info import MediaInfo
+from library import get_library_index, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS
 
-def get_media_duration(file_path):
+def probe_media(file_path):
     """
-    Get duration of a media file using ffprobe.
-    Returns float seconds.
+    Get full metadata (format + all streams) of a media file.
+    One ffprobe call per file; results are cached on disk, so
+    unchanged files are only probed once. Files ffprobe rejects are
+    cached too (until they change), so they are not retried every run.
+    Returns MediaInfo (duration 0.0 and no streams if probing failed).
+    """
+    cached = get_probe_cache().get(file_path, "media")
+    if cached is not None:
+        return MediaInfo.from_dict(file_path, cached)
+    return _probe_media(file_path)
+
+def _probe_media(file_path):
+    """
+    Run ffprobe for one file and store the result in the probe cache.
+    A file ffprobe ran on but could not read is stored as {"error": ...},
+    which decodes to an empty MediaInfo; failures to start ffprobe are not
+    the file's fault and are not stored.
     """
     try:
         ffprobe = get_ffprobe_path()
         cmd = [
             ffprobe, 
             '-v', 'error', 
-            '-show_entries', 'format=duration', 
-            '-of', 'default=noprint_wrappers=1:nokey=1', 
+            '-show_format', 
+            '-show_streams', 
+            '-of', 'json', 
             file_path
         ]
-        output = subprocess.check_output(cmd, creationflags=subprocess.CREATE_NO_WINDOW).decode('utf-8').strip()
-        return float(output)
+        result = run_process(cmd, capture_stdout=True)
+    except Exception as e:
+        print(f"Error probing {file_path}: {e}")
+        return MediaInfo(file_path)
+
+    try:
+        if not result.ok:
+            raise ProcessError(result.last_error(), result)
+        info = MediaInfo.from_ffprobe(file_path, json.loads(result.stdout))
     except Exception as e:
         print(f"Error probing {file_path}: {e}")
-        return 0.0
+        get_probe_cache().put(file_path, "media", {"error": str(e)})
+        return MediaInfo(file_path)
+    get_probe_cache().put(file_path, "media", info.to_dict())
+    return info
+
+def get_media_duration(file_path):
+    """
+    Get duration of a media file using ffprobe.
+    Returns float seconds.
+    """
+    return probe_media(file_path).duration
+
+def get_probe_workers():
+    """Default number of concurrent ffprobe processes."""
+    return min(8, (os.cpu_count() or 1) * 2)
+
+def probe_many(paths, workers=None, cancel_token=None):
+    """
+    Probe many files concurrently.
+    Cached files are answered inline; only misses start ffprobe,
+    with at most `workers` processes running at once.
+    Returns dict of path -> MediaInfo.
+    """
+    return probe_many_cached(
+        paths, "media", _probe_media, workers,
+        decode=lambda path, data: MediaInfo.from_dict(path, data),
+        cancel_token=cancel_token
+    )
+
+def wait_result(future, cancel_token=None, poll=0.2):
+    """future.result(), raising MixCancelled as soon as cancel_token fires."""
+    if cancel_token is None:
+        return future.result()
+    while True:
+        try:
+            return future.result(timeout=poll)
+        except FutureTimeout:
+            cancel_token.raise_if_cancelled()
+
+def probe_many_cached(paths, kind, probe_func, workers=None, decode=None, cancel_token=None):
+    """
+    Shared bulk-probe helper: answer `kind` entries from the probe cache
+    and run probe_func(path) for the misses on a bounded thread pool.
+    probe_func is responsible for storing its own results in the cache.
+    decode(path, cached_value) turns a cache entry back into a result.
+    paths may be a generator (e.g. iter_media): misses start probing while
+    it is still producing paths.
+    Cancelling cancel_token drops the queued probes and raises MixCancelled
+    (probes already running finish on their own).
+    """
+    if workers is None:
+        workers = get_probe_workers()
+    
+    cache = get_probe_cache()
+    results = {}
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        try:
+            for path in paths:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                if path in results or path in pending:
+                    continue
+                cached = cache.get(path, kind)
+                if cached is not None:
+                    results[path] = decode(path, cached) if decode else cached
+                else:
+                    pending[path] = pool.submit(probe_func, path)
+            for path, future in pending.items():
+                results[path] = wait_result(future, cancel_token)
+        except MixCancelled:
+            for future in pending.values():
+                future.cancel()
+            raise
+    return results
+
+def within_duration(duration, min_duration=None, max_duration=None):
+    """True if duration lies inside the optional [min_duration, max_duration] range."""
+    if min_duration is not None and duration < min_duration:
+        return False
+    if max_duration is not None and duration > max_duration:
+        return False
+    return True
+
+def _matches_any(rel_path, patterns):
+    """Case-insensitive glob match against the relative path or the bare file name."""
+    rel_path = rel_path.replace(os.sep, '/').lower()
+    name = rel_path.rsplit('/', 1)[-1]
+    for pattern in patterns:
+        pattern = pattern.replace(os.sep, '/').lower()
+        if fnmatch.fnmatchcase(rel_path, pattern) or fnmatch.fnmatchcase(name, pattern):
+            return True
+    return False
+
+def iter_media(folder_path, extensions, recursive=True, include=None, exclude=None,
+               min_duration=None, max_duration=None):
+    """
+    Lazily yield media files under folder_path.
+
+    Folders are walked with os.scandir through the library index (unchanged
+    folders are not listed again) and files are yielded as each folder is
+    read. include/exclude are glob patterns matched against the path
+    relative to folder_path or the file name ("intro_*", "raw/*").
+    min/max_duration (seconds) use probe metadata, which comes from the
+    probe cache for files seen before; filtering by duration probes the rest.
+    """
+    if not os.path.isdir(folder_path):
+        return
+    root = os.path.abspath(folder_path)
+    for path, _, _ in get_library_index().iter_entries(root, extensions, recursive):
+        rel_path = os.path.relpath(path, root)
+        if include and not _matches_any(rel_path, include):
+            continue
+        if exclude and _matches_any(rel_path, exclude):
+            continue
+        if min_duration is not None or max_duration is not None:
+            if not within_duration(probe_media(path).duration, min_duration, max_duration):
+                continue
+        yield path
 
 def scan_folder(folder_path, extensions):
     """
     Scan folder for files with specific extensions.
+    Answered from the library index; only folders that changed are listed.
     """
-    files = []
-    if not os.path.isdir(folder_path):
-        return files
-        
-    for f in os.listdir(folder_path):
-        if any(f.lower().endswith(ext) for ext in extensions):
-            full_path = os.path.join(folder_path, f)
-            files.append(full_path)
-    return files
+    return list(iter_media(folder_path, extensions, recursive=False))
 
 def get_video_files(folder_path):
-    return scan_folder(folder_path, ['.mp4', '.mov', '.avi', '.mkv'])
+    return scan_folder(folder_path, VIDEO_EXTENSIONS)
 
 def get_audio_files(folder_path):
-    return scan_folder(folder_path, ['.mp3', '.wav', '.aac', '.m4a'])
+    return scan_folder(folder_path, AUDIO_EXTENSIONS)
+
+def order_playlist(files, order="random", rng=None):
+    """
+    Return a copy of files in playlist order.
+    order: "random", "alphabetical" or "manual" (keep the given order).
+    rng: random.Random for the "random" order (default: the random module)
+    """
+    files = list(files)
+    if order == "alphabetical":
+        files.sort(key=lambda x: os.path.basename(x).lower())
+    elif order == "random":
+        (rng or random).shuffle(files)
+    return files